@@ -5,16 +5,20 @@ webdriver_manager==4.0.1
 Preparação
 -pip install selenium==3.14.0 webdriver_manager
 """
-from datetime import date, timedelta
-from time import sleep
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from datetime import date, datetime, timedelta
+from queue import Empty, Queue
+from threading import Event, Lock, get_ident, local
+from time import perf_counter, sleep, time as _now
+import atexit
+import base64
+import hashlib
+import json
+import os
 
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.support.wait import WebDriverWait
-
-import pandas as _pd
-import os as _os
+# selenium e pandas são importados somente nas funções que os usam, para que o planejamento
+# da escala (e o --help) não pague o carregamento das bibliotecas pesadas
 
 def _import_webdriver(name:str="firefox"):
     if name.lower() == "chrome":
@@ -31,32 +35,912 @@ def _import_webdriver(name:str="firefox"):
         from selenium.webdriver import Edge as Browser
     return Browser, Options, DriverManager
 
+def _parse_date(day:str) -> date:
+    """Converte "DD/MM/AA" ou "DD/MM/AAAA" em datetime.date"""
+    d, m, y = map(int, day.strip().split("/"))
+    return date(y if y > 99 else y + 2000, m, d)
+
+def _normalize_address(address:str) -> str:
+    """Normaliza um endereço para comparação: caixa, espaços e o país no final"""
+    address = " ".join(address.casefold().split())
+    for country in [", brazil", ", brasil"]:
+        if address.endswith(country):
+            address = address[:-len(country)]
+    return address
+
+def _valid_time(time:str) -> bool:
+    """Confere se `time` está no formato "HH:MM" """
+    i, j = time.split(":")
+    return len(i) == 2 and len(j) == 2 and int(i) < 24 and int(j) < 60
+
+# Turno de cada letra da escala: D (dia), N (noite) e F (folga)
+_ROTATION_SHIFTS = {"d": "day", "n": "night", "f": None}
+
+def _parse_rotation(rotation:str, shift:str="") -> tuple:
+    """
+    Expande a escala `rotation` no turno de cada dia do ciclo, `None` nas folgas
+
+    Aceita blocos "<dias><turno>" somados por "+", como "3D+3N", "7D+7F" ou "2D+2N+4F",
+    e o formato "<trabalho>x<folga>", como "14x14", trabalhado no turno `shift`. Sem
+    escala, todos os dias são do turno `shift`.
+    """
+    pattern = rotation.replace(" ", "").lower()
+    if not pattern:
+        return (shift,)
+    try:
+        if "x" in pattern:
+            on, off = map(int, pattern.split("x"))
+            cycle = (shift or "day",) * on + (None,) * off
+        else:
+            cycle = tuple(s for block in pattern.split("+")
+                          for s in [_ROTATION_SHIFTS[block[-1]]] * int(block[:-1]))
+    except (KeyError, ValueError, IndexError):
+        raise ValueError(f"Escala '{rotation}' inválida, use blocos como '3D+3N', '7D+7F' ou '14x14'")
+    if not any(cycle):
+        raise ValueError(f"Escala '{rotation}' sem nenhum dia de trabalho")
+    return cycle
+
+def _percentile(values:list, q:float) -> float:
+    """Percentil `q` (0 a 100) pelo método do posto mais próximo"""
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[max(0, min(len(values) - 1, round(q / 100 * len(values) + 0.5) - 1))]
+
+class _Tracer:
+    """
+    Registra a duração de cada etapa (span) do login e do agendamento
+
+    Os eventos seguem o formato de trace do Chrome ("ph": "X") e o arquivo gravado pode
+    ser aberto no Perfetto (ui.perfetto.dev) ou no chrome://tracing.
+    """
+    def __init__(self):
+        self.events = []
+        self._lock = Lock()
+        self._origin = perf_counter()
+
+    @contextmanager
+    def span(self, name:str, **args):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            event = {"name": name,
+                     "cat": name.split(".")[0],
+                     "ph": "X",
+                     "ts": round((start - self._origin) * 1e6),
+                     "dur": round((perf_counter() - start) * 1e6),
+                     "pid": os.getpid(),
+                     "tid": get_ident(),
+                     "args": {k: str(v) for k, v in args.items()}}
+            with self._lock:
+                self.events.append(event)
+
+    def export(self, path:str):
+        """
+        Grava os eventos no arquivo `path` como um documento JSON {"traceEvents": [...]},
+        com um evento por linha para facilitar a leitura e o diff
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            f.write('{"traceEvents": [\n')
+            f.write(",\n".join(json.dumps(event, ensure_ascii=False) for event in self.events))
+            f.write("\n]}\n")
+
+    def summary(self) -> str:
+        """Tabela com o tempo gasto por etapa, somado em todas as corridas"""
+        steps = dict()
+        for event in self.events:
+            steps.setdefault(event["name"], []).append(event["dur"] / 1e6)
+        lines = ["%-16s %5s %9s %8s %8s %8s" % ("etapa", "n", "total(s)", "média", "p95", "máx")]
+        for name, durations in sorted(steps.items(), key=lambda x: -sum(x[1])):
+            lines.append("%-16s %5i %9.2f %8.3f %8.3f %8.3f" % (name,
+                                                                len(durations),
+                                                                sum(durations),
+                                                                sum(durations) / len(durations),
+                                                                _percentile(durations, 95),
+                                                                max(durations)))
+        return "\n".join(lines)
+
+# Pasta onde ficam os caches persistentes entre execuções
+_CACHE_DIR = os.environ.get("MOBICITY_CACHE", os.path.join(os.path.expanduser("~"), ".mobicity"))
+
+def _read_cache(name:str) -> dict:
+    """Lê o cache `name` da pasta de cache, retornando um dicionário vazio se não existir"""
+    try:
+        with open(os.path.join(_CACHE_DIR, name), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return dict()
+
+def _write_cache(name:str, data:dict):
+    """Grava o cache `name` de forma atômica, para não corromper com execuções simultâneas"""
+    os.makedirs(_CACHE_DIR, exist_ok=True)
+    path = os.path.join(_CACHE_DIR, name)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+    os.replace(path + ".tmp", path)
+
+# Drivers já resolvidos neste processo, compartilhados por todas as sessões
+_drivers = dict()
+_drivers_lock = Lock()
+
+def _resolve_driver(name:str, DriverManager, refresh:bool=False) -> str:
+    """
+    Retorna o caminho do WebDriver para o navegador `name`
+
+    A resolução pelo `DriverManager().install()` consulta a versão do navegador instalado
+    (no Windows, pelo PowerShell) e pode baixar o driver, por isso o resultado é guardado
+    em memória, para as demais sessões do processo, e em disco (`drivers.json`), para as
+    próximas execuções. O driver guardado é usado sem consultar versões; se o navegador
+    foi atualizado e ele não abre mais, o `_launch_browser` chama de novo com `refresh`,
+    que descarta o resultado guardado e resolve novamente.
+    """
+    name = name.lower()
+    with _drivers_lock:
+        if not refresh and name in _drivers:
+            return _drivers[name]
+
+        cache = _read_cache("drivers.json")
+        path = cache.get(name, "")
+        # Formato antigo, indexado pela versão do navegador
+        if not isinstance(path, str):
+            path = ""
+        if refresh or not os.path.isfile(path):
+            path = DriverManager().install()
+            cache[name] = path
+            _write_cache("drivers.json", cache)
+
+        _drivers[name] = path
+        return path
+
+class _Journal:
+    """
+    Diário das corridas em SQLite, gravado a cada mudança de situação
+
+    Cada viagem planejada ocupa uma linha, por usuário, dia e sentido, com a situação
+    "pending", "in-flight", "booked" ou "failed". Uma execução interrompida (navegador
+    fechado, computador suspenso, ...) deixa registrado o que já foi agendado, e a próxima
+    envia apenas o restante.
+    """
+    _schema = """
+        CREATE TABLE IF NOT EXISTS rides (
+            user TEXT NOT NULL,
+            day TEXT NOT NULL,
+            way TEXT NOT NULL,
+            date TEXT NOT NULL,
+            time TEXT NOT NULL,
+            origin TEXT NOT NULL,
+            destination TEXT NOT NULL,
+            state TEXT NOT NULL,
+            error TEXT,
+            updated REAL NOT NULL,
+            PRIMARY KEY (user, day, way)
+        )
+    """
+
+    def __init__(self, path:str):
+        import sqlite3
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Sem transação implícita: cada mudança de situação é gravada na hora
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = Lock()
+        with self._lock:
+            # WAL resiste à queda do processo sem um fsync por corrida
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(self._schema)
+
+    def plan(self, user:str, rides:dict) -> set:
+        """
+        Registra as viagens do usuário e retorna as que já constam como agendadas
+
+        Parameters:
+        -----------
+        user : str
+            E-mail do usuário.
+        rides : dict
+            Viagens no formato {(dia, sentido): (data, horário, origem, destino)}, como
+            no `_ride_key`. As que já estão no diário com os mesmos dados mantêm a
+            situação; as novas ou alteradas voltam a "pending".
+
+        Returns:
+        --------
+        set
+            Chaves `(dia, sentido)` das viagens com situação "booked".
+        """
+        with self._lock:
+            stored = {(day, way): (tuple(row[:4]), row[4]) for day, way, *row in self._db.execute(
+                "SELECT day, way, date, time, origin, destination, state FROM rides WHERE user = ?", (user,))}
+            rows = []
+            for (day, way), key in rides.items():
+                key = (key[0].isoformat(),) + tuple(key[1:])
+                if stored.get((day.isoformat(), way), (None,))[0] != key:
+                    rows.append((user, day.isoformat(), way) + key + ("pending", _now()))
+            self._db.execute("BEGIN")
+            self._db.executemany("INSERT OR REPLACE INTO rides "
+                                 "(user, day, way, date, time, origin, destination, state, updated) "
+                                 "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self._db.execute("COMMIT")
+        changed = {(row[1], row[2]) for row in rows}
+        return {(day, way) for (day, way) in rides
+                if (day.isoformat(), way) not in changed and stored[(day.isoformat(), way)][1] == "booked"}
+
+    def mark(self, user:str, day:date, way:str, state:str, error=None):
+        """Grava a nova situação `state` da viagem, com o erro das que falharam"""
+        with self._lock:
+            self._db.execute("UPDATE rides SET state = ?, error = ?, updated = ? WHERE user = ? AND day = ? AND way = ?",
+                             (state, str(error) if error is not None else None, _now(), user, day.isoformat(), way))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+# Sessões autenticadas guardadas entre execuções, criptografadas com a senha do usuário
+_sessions_lock = Lock()
+
+def _session_cipher(email:str, password:str, salt:bytes):
+    """Cifra Fernet com chave derivada (PBKDF2) do e-mail e da senha do Mobicity"""
+    try:
+        from cryptography.fernet import Fernet
+    except ImportError:
+        raise ImportError("Para guardar a sessão é necessário instalar o pacote: pip install cryptography")
+    key = hashlib.pbkdf2_hmac("sha256", (email + password).encode(), salt, 200_000)
+    return Fernet(base64.urlsafe_b64encode(key))
+
+def _session_id(email:str) -> str:
+    return hashlib.sha256(email.lower().encode()).hexdigest()
+
+def _load_session(email:str, password:str) -> dict:
+    """
+    Retorna os cookies e o localStorage guardados para `email`, ou um dicionário vazio
+    se não houver sessão, se ela não abrir com esta senha ou se os cookies já expiraram
+    """
+    with _sessions_lock:
+        entry = _read_cache("sessions.json").get(_session_id(email))
+    if not entry:
+        return dict()
+    try:
+        cipher = _session_cipher(email, password, base64.b64decode(entry["salt"]))
+        state = json.loads(cipher.decrypt(entry["token"].encode()))
+    except ImportError:
+        raise
+    except Exception:
+        return dict()
+    expiries = [c["expiry"] for c in state["cookies"] if "expiry" in c]
+    if expiries and max(expiries) < _now():
+        return dict()
+    return state
+
+def _save_session(email:str, password:str, state:dict):
+    """Grava os cookies e o localStorage de `email` criptografados"""
+    salt = os.urandom(16)
+    token = _session_cipher(email, password, salt).encrypt(json.dumps(state).encode())
+    with _sessions_lock:
+        sessions = _read_cache("sessions.json")
+        sessions[_session_id(email)] = {"salt": base64.b64encode(salt).decode(),
+                                        "token": token.decode()}
+        _write_cache("sessions.json", sessions)
+
+# Sugestões de endereço já escolhidas no painel, {endereço normalizado: sugestão}, lidas
+# do cache persistente na primeira consulta
+_places = None
+_places_lock = Lock()
+
+def _cached_place(address:str) -> dict:
+    """Sugestão guardada para o endereço `address`, ou None"""
+    global _places
+    with _places_lock:
+        if _places is None:
+            _places = _read_cache("places.json")
+        return _places.get(_normalize_address(address))
+
+def _store_place(address:str, place:dict=None):
+    """Guarda a sugestão `place` do endereço `address`, ou a descarta se `place` for None"""
+    global _places
+    with _places_lock:
+        if _places is None:
+            _places = _read_cache("places.json")
+        key = _normalize_address(address)
+        if _places.get(key) == place:
+            return
+        if place is None:
+            _places.pop(key)
+        else:
+            _places[key] = place
+        _write_cache("places.json", _places)
+
+# Tamanho fixo da janela no modo enxuto, suficiente para o formulário de agendamento
+_LEAN_WINDOW_SIZE = (1280, 800)
+
+def _sandboxed() -> bool:
+    """Indica se o Chromium pode usar o sandbox, que não abre como root nem em contêiner"""
+    root = hasattr(os, "geteuid") and os.geteuid() == 0
+    return not (root or os.path.exists("/.dockerenv") or os.path.exists("/run/.containerenv"))
+
+def _browser_kwargs(name:str, Options, lean:bool=False) -> dict:
+    """
+    Monta os argumentos de abertura do navegador (opções e capacidades)
+
+    No modo enxuto o navegador roda sem janela, sem GPU, sem extensões, sem imagens e
+    com uma janela pequena de tamanho fixo. A estratégia de carregamento "eager" libera
+    o `get` assim que o DOM fica pronto, o restante é coberto pelas esperas da página.
+
+    No selenium fixado em requeriments.txt (3.14) a estratégia de carregamento só chega
+    ao driver pelas capacidades (`pageLoadStrategy`), e o Edge não recebe opções: dele o
+    modo enxuto aproveita apenas o carregamento "eager" e a janela de tamanho fixo.
+    """
+    from selenium.webdriver import DesiredCapabilities
+
+    if name.lower() == "edge":
+        if not lean:
+            return {}
+        options = Options()
+        options.page_load_strategy = "eager"
+        return {"capabilities": options.to_capabilities()}
+
+    options = Options()
+    options.add_argument('--log-level=3')
+    if not lean:
+        return {"options": options}
+
+    if name.lower() == "firefox":
+        capabilities = DesiredCapabilities.FIREFOX.copy()
+        options.add_argument("-headless")
+        options.add_argument("--width=%i" % _LEAN_WINDOW_SIZE[0])
+        options.add_argument("--height=%i" % _LEAN_WINDOW_SIZE[1])
+        options.set_preference("layers.acceleration.disabled", True)
+        options.set_preference("permissions.default.image", 2)
+        options.set_preference("media.autoplay.default", 5)
+    else:
+        capabilities = DesiredCapabilities.CHROME.copy()
+        options.add_argument("--headless=new")
+        options.add_argument("--disable-gpu")
+        options.add_argument("--disable-extensions")
+        options.add_argument("--disable-dev-shm-usage")
+        if not _sandboxed():
+            options.add_argument("--no-sandbox")
+        options.add_argument("--blink-settings=imagesEnabled=false")
+        options.add_argument("--window-size=%i,%i" % _LEAN_WINDOW_SIZE)
+    capabilities["pageLoadStrategy"] = "eager"
+    return {"options": options, "desired_capabilities": capabilities}
+
+def _launch_browser(name:str, lean:bool=False, driver_path:str="", span=None):
+    """
+    Abre o navegador `name` (driver e processo) e retorna a instância do WebDriver
+
+    Sem `driver_path`, o driver é resolvido pelo `_resolve_driver`. `span` é o `_span` do
+    `Mobicity` que mede as etapas, quando houver.
+    """
+    from selenium.common.exceptions import SessionNotCreatedException
+
+    if driver_path and not os.path.isfile(driver_path):
+        raise ValueError("WebDriver '%s' não encontrado" % driver_path)
+    span = span or (lambda name: nullcontext())
+    Browser, Options, DriverManager = _import_webdriver(name)
+    kwargs = _browser_kwargs(name, Options, lean)
+
+    if driver_path:
+        browser = Browser(executable_path=driver_path, **kwargs)
+    else:
+        with span("login.driver"):
+            executable_path = _resolve_driver(name, DriverManager)
+        try:
+            browser = Browser(executable_path=executable_path, **kwargs)
+        except SessionNotCreatedException:
+            # O navegador foi atualizado e o driver guardado não serve mais
+            executable_path = _resolve_driver(name, DriverManager, refresh=True)
+            browser = Browser(executable_path=executable_path, **kwargs)
+    if lean:
+        browser.set_window_size(*_LEAN_WINDOW_SIZE)
+    else:
+        browser.maximize_window()
+    return browser
+
+# Navegadores abertos com antecedência pelo `prelaunch`, {(navegador, enxuto, driver,
+# página): [Future, ...]}, à espera do próximo login com as mesmas opções
+_prelaunched = dict()
+_prelaunched_lock = Lock()
+
+def prelaunch(browser_name:str="firefox", lean:bool=False, driver_path:str="", url:str=""):
+    """
+    Abre em segundo plano um navegador já na página de login do Mobicity
+
+    O próximo login pelo navegador com o mesmo `browser_name`, `lean` e `driver_path` usa
+    esse navegador em vez de abrir outro, de forma que a resolução do driver, a partida do
+    navegador e a página de login carregam enquanto o usuário ainda responde as perguntas.
+    Se a abertura falhar, o login abre o navegador normalmente. Um navegador que não
+    chegar a ser usado é fechado ao final do programa.
+    """
+    url = url or Mobicity._link_mobicity
+
+    def job():
+        browser = _launch_browser(browser_name, lean, driver_path)
+        browser.get(url)
+        return browser
+
+    pool = ThreadPoolExecutor(max_workers=1)
+    with _prelaunched_lock:
+        if not _prelaunched:
+            atexit.register(_quit_prelaunched)
+        _prelaunched.setdefault((browser_name.lower(), bool(lean), driver_path, url), []).append(pool.submit(job))
+    pool.shutdown(wait=False)
+
+def _take_prelaunched(browser_name:str, lean:bool, driver_path:str, url:str):
+    """Navegador aberto pelo `prelaunch` com essas opções, ou None se não houver"""
+    with _prelaunched_lock:
+        futures = _prelaunched.get((browser_name.lower(), bool(lean), driver_path, url))
+        future = futures.pop(0) if futures else None
+    try:
+        return future.result() if future else None
+    except Exception:
+        return None
+
+def _quit_prelaunched():
+    with _prelaunched_lock:
+        futures = [future for futures in _prelaunched.values() for future in futures]
+        _prelaunched.clear()
+    for future in futures:
+        try:
+            future.result().quit()
+        except Exception:
+            pass
+
+# Intervalo, em segundos, entre as verificações das esperas do navegador
+_POLL_FREQUENCY = 0.1
+
+# Tempo de espera de cada etapa aprendido com as execuções anteriores: p99 das durações
+# guardadas vezes `_WAIT_MARGIN`, entre `_WAIT_MIN` e `_WAIT_MAX` segundos. Enquanto a
+# etapa não tem `_WAIT_MIN_SAMPLES` medições, espera `_WAIT_DEFAULT` segundos.
+_WAIT_DEFAULT = 30
+_WAIT_MIN = 2
+_WAIT_MAX = 60
+_WAIT_MARGIN = 3
+_WAIT_MIN_SAMPLES = 20
+# Medições guardadas por etapa, as mais recentes
+_WAIT_SAMPLES = 200
+
+# Durações das etapas, {etapa: [segundos, ...]}, lidas do cache persistente no primeiro uso
+_waits = None
+_waits_changed = False
+_waits_lock = Lock()
+# Prazo (em `perf_counter`) da viagem em andamento em cada thread
+_ride_deadline = local()
+
+def _wait_samples(step:str) -> list:
+    """Durações guardadas da etapa `step`"""
+    global _waits
+    with _waits_lock:
+        if _waits is None:
+            _waits = _read_cache("waits.json")
+        return list(_waits.get(step, []))
+
+def _learned_timeout(step:str, default:float=_WAIT_DEFAULT, minimum:float=_WAIT_MIN,
+                     maximum:float=_WAIT_MAX) -> float:
+    """Tempo de espera da etapa `step`, ou `default` se ainda não há medições suficientes"""
+    samples = _wait_samples(step)
+    if len(samples) < _WAIT_MIN_SAMPLES:
+        return default
+    return max(minimum, min(maximum, _percentile(samples, 99) * _WAIT_MARGIN))
+
+def _record_wait(step:str, seconds:float):
+    """Guarda a duração `seconds` da etapa `step`, descartando as medições mais antigas"""
+    global _waits_changed
+    _wait_samples(step)
+    with _waits_lock:
+        samples = _waits.setdefault(step, [])
+        samples.append(round(seconds, 3))
+        del samples[:-_WAIT_SAMPLES]
+        _waits_changed = True
+
+def _save_waits():
+    """Grava as durações guardadas, se houve alguma medição nova"""
+    global _waits_changed
+    with _waits_lock:
+        if _waits_changed:
+            _write_cache("waits.json", _waits)
+            _waits_changed = False
+
+@contextmanager
+def _deadline(seconds:float):
+    """Limita a `seconds` o tempo somado das esperas da thread dentro do bloco (0 sem limite)"""
+    _ride_deadline.at = perf_counter() + seconds if seconds else None
+    try:
+        yield
+    finally:
+        _ride_deadline.at = None
+
+def _wait(browser, condition, timeout:float=None):
+    """
+    Aguarda até que `condition(browser)` retorne um valor verdadeiro e o retorna
+
+    A condição é verificada a cada `_POLL_FREQUENCY` segundos, de forma que a espera
+    dura apenas o tempo que a página realmente precisa. Sem `timeout`, o tempo de espera
+    vem das durações já medidas da etapa (o atributo `step` da condição), e nunca passa
+    do prazo da viagem em andamento.
+    """
+    from selenium.common.exceptions import (NoSuchElementException, StaleElementReferenceException,
+                                            TimeoutException)
+    from selenium.webdriver.support.wait import WebDriverWait
+
+    step = getattr(condition, "step", None)
+    if timeout is None:
+        timeout = _learned_timeout(step) if step else _WAIT_DEFAULT
+    limit = timeout
+    at = getattr(_ride_deadline, "at", None)
+    if at is not None:
+        limit = min(timeout, at - perf_counter())
+        if limit <= 0:
+            raise TimeoutException("Prazo da viagem esgotado antes de '%s'" % step)
+
+    start = perf_counter()
+    try:
+        value = WebDriverWait(browser, limit, poll_frequency=_POLL_FREQUENCY,
+                              ignored_exceptions=(NoSuchElementException,
+                                                  StaleElementReferenceException)).until(condition)
+    except TimeoutException:
+        # A espera esgotada entra como medição (no mínimo esse tempo), de forma que num dia
+        # lento as próximas esperas da etapa crescem. O prazo da viagem não conta.
+        if step and limit == timeout:
+            _record_wait(step, timeout)
+        raise
+    if step:
+        _record_wait(step, perf_counter() - start)
+    return value
+
+def _wait_any(browser, timeout:float=None, **outcomes):
+    """
+    Aguarda o primeiro dentre vários desfechos possíveis
+
+    Todas as condições em `outcomes` são verificadas a cada ciclo, retornando a tupla
+    `(nome, valor)` da primeira que for satisfeita. Assim um desfecho que não ocorre
+    nunca precisa esgotar o seu tempo de espera.
+    """
+    from selenium.common.exceptions import NoSuchElementException, StaleElementReferenceException
+
+    def condition(browser):
+        for name, outcome in outcomes.items():
+            try:
+                value = outcome(browser)
+            except (NoSuchElementException, StaleElementReferenceException):
+                continue
+            if value:
+                return name, value
+        return False
+    condition.step = "any." + "|".join(outcomes)
+    return _wait(browser, condition, timeout)
+
+# Localizador que encontrou cada elemento do `_site_map` da última vez, {chave: [estratégia,
+# valor]}, lido do cache persistente na primeira busca
+_locators = None
+_locators_lock = Lock()
+
+def _candidates(key:str) -> list:
+    """Localizadores do elemento `key` do `_site_map`, começando pelo último que funcionou"""
+    global _locators
+    with _locators_lock:
+        if _locators is None:
+            _locators = _read_cache("selectors.json")
+        last = _locators.get(key)
+    candidates = Mobicity._site_map[key]
+    return ([last] if last in candidates else []) + [c for c in candidates if c != last]
+
+def _remember_locator(key:str, locator:list):
+    """Guarda `locator` como o localizador que encontrou o elemento `key`"""
+    with _locators_lock:
+        if _locators.get(key) == locator:
+            return
+        _locators[key] = locator
+        _write_cache("selectors.json", _locators)
+
+def _find_all(browser, key:str) -> list:
+    """
+    Elementos `key` do `_site_map`, pelo primeiro localizador candidato que encontrar algum
+
+    Cada candidato custa uma busca imediata, sem espera, então uma mudança nas classes do
+    painel custa alguns milissegundos e não o tempo de espera inteiro de cada viagem.
+    Retorna uma lista vazia se nenhum candidato encontrar o elemento.
+    """
+    for locator in _candidates(key):
+        elems = browser.find_elements(*locator)
+        if elems:
+            _remember_locator(key, locator)
+            return elems
+    return []
+
+def _find(browser, key:str):
+    """Primeiro elemento `key` do `_site_map`, levantando NoSuchElementException se não houver"""
+    elems = _find_all(browser, key)
+    if not elems:
+        from selenium.common.exceptions import NoSuchElementException
+        raise NoSuchElementException("Nenhum localizador de '%s' encontrou o elemento" % key)
+    return elems[0]
+
+def _condition(step:str, check):
+    """Marca a condição `check` com a etapa cujas durações definem o tempo de espera"""
+    check.step = step
+    return check
+
+def _present(key:str):
+    """Condição: o elemento `key` do `_site_map` está na página"""
+    return _condition("present." + key, lambda browser: _find(browser, key))
+
+def _absent(key:str):
+    """Condição: o elemento `key` do `_site_map` não está mais na página"""
+    return _condition("absent." + key, lambda browser: not _find_all(browser, key))
+
+def _present_text(key:str, text:str):
+    """Condição: algum elemento `key` do `_site_map` exibe o texto `text`"""
+    return _condition("text." + key, lambda browser: next((elem for elem in _find_all(browser, key)
+                                                           if elem.text == text), False))
+
+class RideError(ValueError):
+    """
+    Falha ao agendar uma viagem
+
+    O atributo `retry` define o que o `setup_rides` faz com a falha: `None` não tenta de
+    novo (falha definitiva), "ride" tenta a mesma viagem de novo após uma espera crescente
+    e "login" abre uma nova sessão antes de tentar de novo. Herda de ValueError, como os
+    erros que o agendamento sempre levantou.
+    """
+    retry = None
+
+class AlreadyBooked(RideError):
+    """Já existe uma corrida agendada no mesmo dia e horário"""
+
+class TooLate(RideError):
+    """O horário já passou do prazo de agendamento ("Tempo anterior")"""
+
+class SelectorMissing(RideError):
+    """Um elemento esperado não existe na página, o painel mudou"""
+
+class RideTimeout(RideError):
+    """O painel não respondeu a tempo"""
+    retry = "ride"
+
+class RideNotConfirmed(RideError):
+    """A corrida foi enviada, mas não aparece na leitura do painel"""
+    retry = "ride"
+
+class SessionLost(RideError):
+    """A sessão (navegador ou token) caiu no meio do agendamento"""
+    retry = "login"
+
+# Falhas das bibliotecas (selenium, requests, aiohttp) pelo nome da classe, para não
+# precisar importá-las só para classificar
+_RIDE_ERRORS = {
+    "NoSuchElementException": SelectorMissing,
+    "TimeoutException": RideTimeout,
+    "Timeout": RideTimeout,
+    "TimeoutError": RideTimeout,
+    "InvalidSessionIdException": SessionLost,
+    "NoSuchWindowException": SessionLost,
+    "ConnectionError": SessionLost,
+    "ClientConnectionError": SessionLost,
+}
+
+# Espera, em segundos, antes da primeira nova tentativa; dobra a cada tentativa
+_RETRY_BACKOFF = 1.0
+
+def _ride_error(error:Exception) -> Exception:
+    """Converte a falha de uma viagem na RideError correspondente, se houver"""
+    if isinstance(error, RideError):
+        return error
+    for cls in type(error).__mro__:
+        if cls.__name__ in _RIDE_ERRORS:
+            ride_error = _RIDE_ERRORS[cls.__name__](str(error).strip() or cls.__name__)
+            ride_error.__cause__ = error
+            return ride_error
+    return error
+
+class _Value:
+    """
+    Base dos valores da agenda: imutáveis, com os atributos em `__slots__` e comparação
+    e hash pelos campos `_fields` (os argumentos do construtor)
+    """
+    __slots__ = ()
+    _fields = ()
+
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} é imutável, use replace()")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} é imutável")
+
+    def _astuple(self) -> tuple:
+        return tuple(getattr(self, name) for name in self._fields)
+
+    def __eq__(self, other):
+        return type(other) is type(self) and self._astuple() == other._astuple()
+
+    def __hash__(self):
+        return hash(self._astuple())
+
+    def __reduce__(self):
+        return type(self), self._astuple()
+
+    def __repr__(self):
+        return "%s(%s)" % (type(self).__name__,
+                           ", ".join("%s=%r" % (name, getattr(self, name)) for name in self._fields))
+
+    def replace(self, **changes):
+        """Cópia com os campos `changes` alterados"""
+        return type(self)(*(changes.get(name, getattr(self, name)) for name in self._fields))
+
+class WeekRule(_Value):
+    """
+    Padrão de um sentido num dia da semana de um turno: endereços e horário usados em
+    todas as viagens desse dia da semana
+
+    Parameters:
+    -----------
+    shift : str
+        Turno, `day` ou `night`.
+    weekday : int
+        Dia da semana sendo 0 -> segunda-feira, ... 6-> domingo.
+    way : str
+        Sentido, `to_work` ou `to_home`.
+    home : str, default "home"
+        Nome do endereço de casa.
+    work : str, default "work"
+        Nome do endereço do trabalho.
+    time : str, default ""
+        Horário de partida no formato "HH:MM".
+    """
+    __slots__ = _fields = ("shift", "weekday", "way", "home", "work", "time")
+
+    def __init__(self, shift:str, weekday:int, way:str, home:str="home", work:str="work", time:str=""):
+        if weekday not in range(7):
+            raise ValueError("Existem valores dentro da lista de dias da semana quanão estão entre 0 e 6")
+        if way not in ("to_work", "to_home"):
+            raise ValueError("Sentido deve ser um valor dentre ['to_work', 'to_home']")
+        super().__init__(shift, weekday, way, home, work, time)
+
+class Ride(_Value):
+    """
+    Uma viagem da agenda
+
+    A data é convertida uma única vez na criação. `date` é o dia em que a viagem
+    acontece, que no turno da noite, na ida para casa, é o dia seguinte a `day`.
+
+    Parameters:
+    -----------
+    day : date or str
+        Dia da escala, como datetime.date ou no formato "DD/MM/AA" ou "DD/MM/AAAA".
+    way : str
+        Sentido, `to_work` ou `to_home`.
+    time : str
+        Horário de partida no formato "HH:MM".
+    home : str, default "home"
+        Nome do endereço de casa.
+    work : str, default "work"
+        Nome do endereço do trabalho.
+    shift : str, default "day"
+        Turno do dia, `day` ou `night`.
+    """
+    __slots__ = ("day", "way", "time", "home", "work", "shift", "date")
+    _fields = __slots__[:-1]
+
+    def __init__(self, day, way:str, time:str, home:str="home", work:str="work", shift:str="day"):
+        if isinstance(day, str):
+            day = _parse_date(day)
+        if way not in ("to_work", "to_home"):
+            raise ValueError("Sentido deve ser um valor dentre ['to_work', 'to_home']")
+        try:
+            valid = _valid_time(time)
+        except ValueError:
+            valid = False
+        if not valid:
+            raise ValueError(f"Horário '{time}' fora do formato HH:MM")
+        # se turno da noite e ida para casa, será no dia seguinte
+        ride_date = day + timedelta(days=1) if shift == "night" and way == "to_home" else day
+        super().__init__(day, way, time, home, work, shift, ride_date)
+
+    @property
+    def weekday(self) -> int:
+        """Dia da semana do dia da escala, 0 -> segunda-feira"""
+        return self.day.weekday()
+
+    @property
+    def label(self) -> str:
+        """Data da viagem no formato "DD/MM/AA", como é digitada no painel"""
+        return self.date.strftime(r"%d/%m/%y")
+
+    @property
+    def origin(self) -> str:
+        """Nome do endereço de partida"""
+        return self.home if self.way == "to_work" else self.work
+
+    @property
+    def destination(self) -> str:
+        """Nome do endereço de chegada"""
+        return self.work if self.way == "to_work" else self.home
+
 class Mobicity:
     _link_mobicity = "https://mobicity-dashboard.herokuapp.com/"
     _link_ride_request = "https://mobicity-dashboard.herokuapp.com/travels/request"
+    # Página das corridas agendadas, lida pelo `reconcile` do backend "browser". NÃO
+    # VERIFICADA: o endereço, a tabela (`scheduled_*` do `_site_map`) e a ordem das colunas
+    # (`_scheduled_columns`) foram supostos, como no `mock_dashboard`. Se a leitura falhar,
+    # o `setup_rides` avisa e envia todas as viagens, como sem o `reconcile`.
+    _link_rides = "https://mobicity-dashboard.herokuapp.com/travels"
+    # Endpoints da API consumida pelo painel, usados pelo backend "http" e pela API assíncrona.
+    # NÃO VERIFICADOS: os caminhos, os corpos e os códigos de resposta (400 endereço recusado,
+    # 401 sessão expirada, 409 já agendada, 422 horário anterior) foram supostos, não
+    # capturados do tráfego do painel real, e o `mock_dashboard` segue as mesmas suposições.
+    # Por isso o "http" e a API assíncrona recusam este `_link_api` e só rodam contra um
+    # painel local (`MockDashboard.point`), sem enviar a senha a um endereço suposto.
+    _link_api = "https://mobicity-dashboard.herokuapp.com/api/"
+    _api_map = {
+        "login": ["POST", "auth/login"],
+        "address": ["GET", "places/autocomplete"],
+        "ride": ["POST", "travels"],
+        "rides": ["GET", "travels"]
+    }
+    # Ordem das colunas na tabela de corridas agendadas (não verificada, veja `_link_rides`)
+    _scheduled_columns = ("date", "time", "from", "to")
+    # Campos da agenda em forma colunar (get_schedule_records)
+    _schedule_fields = ("date", "weekday", "way", "time", "origin", "destination")
+    # Localizadores no formato [estratégia, valor], com as estratégias do selenium By
+    # ("xpath", "class name", "id", "css selector") escritas por extenso
+    # Cada elemento tem uma lista de localizadores candidatos, do mais estável (texto,
+    # atributos, caminho a partir de #app) ao mais frágil (classes geradas pelo
+    # styled-components, que mudam a cada versão do painel). Rótulos e atributos supostos,
+    # ainda não vistos no painel real, ficam por último, como reserva para quando os demais
+    # deixarem de encontrar o elemento. O primeiro que encontrar o elemento fica guardado
+    # no cache e é tentado primeiro nas próximas buscas.
     _site_map = {
-        "username": [By.XPATH, '//*[@id="app"]/div/div/div/div/div/div[3]/div[1]/input'],
-        "password": [By.XPATH, '//*[@id="app"]/div/div/div/div/div/div[4]/input'],
-        "date": [By.XPATH, '//*[@id="app"]/div/div/div/div[2]/div/div[2]/div/div[2]/div[1]/div[1]/div[1]/div/div/div[1]/div/input'],
-        "hour": [By.XPATH, '//*[@id="app"]/div/div/div/div[2]/div/div[2]/div/div[2]/div[1]/div[1]/div[2]/div/div/div[1]/div/input'],
-        "from_field": [By.XPATH, "/html/body/div[2]/div/div/div/div[2]/div/div[2]/div/div[2]/div[3]/div[1]/div/div[2]/div/div[1]/input"],
-        # "from_click": [By.XPATH, "/html/body/div[2]/div/div/div/div[2]/div/div[2]/div/div[2]/div[3]/div[1]/div/div[2]/div/div[2]/div/div[2]/div"],
-        "from_click": [By.CLASS_NAME, "sc-htpNat.jYLEny"],
-        "to_field": [By.XPATH, "/html/body/div[2]/div/div/div/div[2]/div/div[2]/div/div[2]/div[3]/div[2]/div/div[2]/div/div[1]/input"],
-        "to_click": [By.XPATH, "/html/body/div[2]/div/div/div/div[2]/div/div[2]/div/div[2]/div[3]/div[2]/div/div[2]/div/div[2]/div/div[2]/div"],
-        # "to_click": [By.CLASS_NAME, "sc-kEYyzF.gksqag"],
-        # "forward": [By.CLASS_NAME, 'sc-htpNat.ewSVoI'],
-        "forward_setup": [By.XPATH, '//*[@id="portal"]/div[2]/div/div[2]/div/div[3]'],
-        "justify": [By.ID, 'react-select-2-input'],
-        "forward_justify": [By.XPATH, '//*[@id="portal"]/div[2]/div/div[2]/div/div[2]/div[2]/div'],
-        "atention": [By.CLASS_NAME, 'sc-bwzfXH.kiYdrG'],
-        "atention_before_time": [By.CLASS_NAME, 'sc-bwzfXH.cJwCtH'],
-        "forward_conclude": [By.CLASS_NAME, 'sc-htpNat.eTZRCP'],
-        "finish": [By.XPATH, '//*[@id="portal"]/div[2]/div/div[2]/div[1]/div[1]/div[1]/label'],
-        "ignore_atention": [By.CLASS_NAME, "sc-EHOje.iwHCmv"]
+        "username": [["css selector", '#app input[type="email"]'],
+                     ["xpath", '//*[@id="app"]/div/div/div/div/div/div[3]/div[1]/input']],
+        "password": [["css selector", '#app input[type="password"]'],
+                     ["xpath", '//*[@id="app"]/div/div/div/div/div/div[4]/input']],
+        "date": [["xpath", '//*[@id="app"]/div/div/div/div[2]/div/div[2]/div/div[2]/div[1]/div[1]/div[1]/div/div/div[1]/div/input'],
+                 ["css selector", '#app input[placeholder^="Data"], #app input[aria-label^="Data"]']],
+        "hour": [["xpath", '//*[@id="app"]/div/div/div/div[2]/div/div[2]/div/div[2]/div[1]/div[1]/div[2]/div/div/div[1]/div/input'],
+                 ["css selector", '#app input[placeholder^="Hor"], #app input[aria-label^="Hor"]']],
+        "from_field": [["xpath", '//*[@id="app"]/div/div/div/div[2]/div/div[2]/div/div[2]/div[3]/div[1]/div/div[2]/div/div[1]/input'],
+                       ["xpath", "/html/body/div[2]/div/div/div/div[2]/div/div[2]/div/div[2]/div[3]/div[1]/div/div[2]/div/div[1]/input"]],
+        "from_click": [["class name", "sc-htpNat.kUpqyC"],
+                       ["class name", "sc-htpNat.jYLEny"],
+                       ["xpath", "/html/body/div[2]/div/div/div/div[2]/div/div[2]/div/div[2]/div[3]/div[1]/div/div[2]/div/div[2]/div/div[2]/div"]],
+        "to_field": [["xpath", '//*[@id="app"]/div/div/div/div[2]/div/div[2]/div/div[2]/div[3]/div[2]/div/div[2]/div/div[1]/input'],
+                     ["xpath", "/html/body/div[2]/div/div/div/div[2]/div/div[2]/div/div[2]/div[3]/div[2]/div/div[2]/div/div[1]/input"]],
+        "to_click": [["xpath", '//*[@id="app"]/div/div/div/div[2]/div/div[2]/div/div[2]/div[3]/div[2]/div/div[2]/div/div[2]/div/div[2]/div'],
+                     ["xpath", "/html/body/div[2]/div/div/div/div[2]/div/div[2]/div/div[2]/div[3]/div[2]/div/div[2]/div/div[2]/div/div[2]/div"],
+                     ["class name", "sc-kEYyzF.gksqag"]],
+        "forward_setup": [["xpath", '//*[@id="portal"]//*[not(*) and normalize-space()="Avançar"]'],
+                          ["xpath", '//*[@id="portal"]/div[2]/div/div[2]/div/div[3]'],
+                          ["class name", 'sc-htpNat.ewSVoI']],
+        "justify": [["id", 'react-select-2-input'],
+                    ["css selector", '#portal input[id^="react-select-"][id$="-input"]']],
+        "justify_option": [["css selector", '[id^="react-select-2-option-"]'],
+                           ["css selector", '[id^="react-select-"][id*="-option-"]']],
+        "forward_justify": [["xpath", '//*[@id="portal"]//*[not(*) and normalize-space()="Avançar"]'],
+                            ["xpath", '//*[@id="portal"]/div[2]/div/div[2]/div/div[2]/div[2]/div'],
+                            ["class name", 'sc-htpNat.ewSVoI']],
+        # Os dois avisos de "Atenção!" se distinguem pela etapa em que aparecem
+        "atention": [["xpath", '//*[@id="portal"]//*[not(*) and normalize-space()="Atenção!"]'],
+                     ["class name", 'sc-bwzfXH.kiYdrG']],
+        "atention_before_time": [["xpath", '//*[@id="portal"]//*[not(*) and normalize-space()="Atenção!"]'],
+                                 ["class name", 'sc-bwzfXH.cJwCtH']],
+        "forward_conclude": [["class name", 'sc-htpNat.lmHVNv'],
+                             ["class name", 'sc-htpNat.eTZRCP'],
+                             ["xpath", '//*[@id="portal"]//*[self::button or @role="button"]'
+                                       '[normalize-space()="Confirmar" or normalize-space()="Concluir"]']],
+        "finish": [["xpath", '//*[@id="portal"]/div[2]/div/div[2]/div[1]/div[1]/div[1]/label'],
+                   ["xpath", '//*[@id="portal"]//label[contains(normalize-space(), "gendada")]']],
+        "ignore_atention": [["class name", "sc-EHOje.iwHCmv"]],
+        # Tabela das corridas agendadas, não verificada (veja `_link_rides`)
+        "scheduled_table": [["css selector", '#app table']],
+        "scheduled_rides": [["css selector", '#app table tbody tr']]
     }
 
-    def __init__(self, shift:str="", time_to_home:str="", time_to_work:str="", start_day:str="", days:int=6, **addresses):
+    def __init__(self, shift:str="", time_to_home:str="", time_to_work:str="", start_day:str="", days:int=6,
+                 rotation:str="", **addresses):
         """
         Configura uma instância com parâmetros para cadastro de viagens no Mobicity
 
@@ -64,14 +948,20 @@ class Mobicity:
         -----------
         shift: str
             Turno com valor `day` (diurno), `night` (noturno).
-        time_to_home : str
-            Horário de ida para casa no formato "HH:MM".
-        time_to_work : str
-            Horário de ida para o trabalho no formato "HH:MM".
+        time_to_home : str or dict
+            Horário de ida para casa no formato "HH:MM", ou um por turno no formato
+            {"day": "HH:MM", "night": "HH:MM"}.
+        time_to_work : str or dict
+            Horário de ida para o trabalho no formato "HH:MM", ou um por turno no formato
+            {"day": "HH:MM", "night": "HH:MM"}.
         start_day : str
             Dia inicial da escala no formato "DD/MM/AAAA" ou como datetime.date.
         days : int, default 6
             Número de dias da escala para cadastro das corridas.
+        rotation : str, default ""
+            Escala de revezamento a partir de `start_day`, em blocos de dias por turno
+            ("3D+3N", "7D+7F", sendo D dia, N noite e F folga) ou "trabalho x folga"
+            ("14x14", no turno `shift`). Vazio agenda todos os dias no turno `shift`.
         **addresses
             Endereços no formato `nome = endereço`.
             * `home` -> endereço para a casa
@@ -116,6 +1006,20 @@ class Mobicity:
 
         # Define o browser para o Firefox
         self.browser_name = "firefox"
+        # Navegador com janela e perfil padrão
+        self.lean = False
+        # Driver local fixo, que dispensa a resolução (e o acesso à internet); sem ele
+        # vale a variável MOBICITY_DRIVER, lida só na abertura do navegador
+        self.driver_path = ""
+        # Reaproveita a sessão autenticada da execução anterior
+        self.keep_session = False
+        # Registro das etapas do agendamento, ativo somente durante o setup_rides com trace
+        self._tracer = None
+        # Novas tentativas de uma viagem após falhas passageiras (RideTimeout, SessionLost)
+        self.retries = 2
+        # Prazo das esperas do navegador em cada tentativa de viagem, em segundos; com 0 é
+        # aprendido com as viagens anteriores
+        self.ride_budget = 0
 
         # Propriedades
         self.shift = shift.lower()
@@ -123,6 +1027,7 @@ class Mobicity:
         self.time_to_work = time_to_work
         self.start_day = start_day
         self.days = days
+        self.rotation = rotation
         
         # Endereços
         self._address_names = []
@@ -137,67 +1042,88 @@ class Mobicity:
             self.home = ""
             self._address_names.append("home")
 
-        # Configuração padrão para todos os dias da semana
-        # _week_schedule no formato:
-        #     {dia_da_semana: {
-        #         para_[casa/trabalho]: {
-        #             "home": endereço_de_casa,
-        #             "work": endereço_do_trabalho,
-        #             "time": horário[HH:MM]
-        #         }
-        #     }
+        # Configuração padrão para todos os dias da semana de cada turno, no formato
+        #     {(turno, dia_da_semana, para_[casa/trabalho]): WeekRule}
+        # e a agenda, na ordem das viagens, no formato
+        #     {(dia, para_[casa/trabalho]): Ride}
+        # A agenda é recalculada somente quando lida (`_daily_schedule`): as regras alteradas
+        # desde a última leitura ficam em `_dirty` e refazem apenas as viagens que as usam,
+        # indexadas em `_rides_by_rule`. Os ajustes do `setup_schedule_ride` ficam em
+        # `_overrides` e valem sobre as regras.
         self._week_schedule = dict()
-        self._daily_schedule = dict()
+        self._rides = dict()
+        self._rides_by_rule = dict()
+        self._overrides = dict()
+        self._dirty = set()
+        # Cópia colunar da agenda, refeita somente depois de alguma alteração
+        self._columns = None
 
-        for weekday in range(7):
-            self._setup_schedule_weekday("to_work", weekday)
-            self._setup_schedule_weekday("to_home", weekday)
+        for shift in ["day", "night"]:
+            for weekday in range(7):
+                self._setup_schedule_weekday("to_work", weekday, shift=shift)
+                self._setup_schedule_weekday("to_home", weekday, shift=shift)
         self.setup_schedule()
 
-    def get_schedule(self) -> _pd.DataFrame:
-        df = _pd.DataFrame()
-        l = 1
-        for day, d in self._daily_schedule.items():
-            day = d["to_work"]["day"]
-            f = d["to_work"]["home"]
-            t = d["to_work"]["work"]
-            h = d["to_work"]["time"]
-            # print({"Dia": day,
-            #          "De": f,
-            #          "Para": t,
-            #          "Horário": h})
-            df[l] = {"Dia": day,
-                     "De": f,
-                     "Para": t,
-                     "Horário": h}
-            l += 1
-    
-            day = d["to_home"]["day"]
-            t = d["to_home"]["home"]
-            f = d["to_home"]["work"]
-            h = d["to_home"]["time"]
-            df[l] = {"Dia": day,
-                     "De": f,
-                     "Para": t,
-                     "Horário": h}
-            l +=1
-        return df.T
+    def get_schedule(self) -> "pandas.DataFrame":
+        """
+        Agenda como DataFrame, uma linha por viagem com as colunas Dia, De, Para e Horário
+        """
+        import pandas as pd
+
+        columns = self._schedule_columns()
+        return pd.DataFrame({"Dia": columns["date"],
+                             "De": columns["origin"],
+                             "Para": columns["destination"],
+                             "Horário": columns["time"]},
+                            index=pd.RangeIndex(1, len(columns["date"]) + 1))
+
+    def get_schedule_records(self) -> list:
+        """
+        Agenda como lista de dicionários, um por viagem, com as chaves de
+        `_schedule_fields`, sem depender do pandas
+        """
+        columns = self._schedule_columns()
+        return [dict(zip(self._schedule_fields, row)) for row in zip(*columns.values())]
+
+    @property
+    def rides(self) -> list:
+        """Viagens (Ride) da agenda, na mesma ordem do `get_schedule`"""
+        return list(self._daily_schedule.values())
+
+    def _schedule_columns(self) -> dict:
+        """
+        Agenda em forma colunar, `{campo: [valor de cada viagem]}`, montada numa única
+        passada e guardada até a próxima alteração da agenda
+        """
+        rides = self._daily_schedule
+        if self._columns is None:
+            columns = {field: [] for field in self._schedule_fields}
+            for ride in rides.values():
+                columns["date"].append(ride.label)
+                columns["weekday"].append(ride.weekday)
+                columns["way"].append(ride.way)
+                columns["time"].append(ride.time)
+                columns["origin"].append(ride.origin)
+                columns["destination"].append(ride.destination)
+            self._columns = columns
+        return self._columns
     
     def __repr__(self):
         week = ["segunda-feira", "terça-feira", "quarta-feira", "quinta-feira", "sexta-feira", "sábado", "domingo"]
         ds = ""
-        for day, d in self._daily_schedule.items():
-            ds += f"{week[d['to_work']['weekday']]} {day.strftime(r'%d/%m/%y')}\n"
-            for way, values in d.items():
-                if way == "to_work":
-                    path = f"{values['home']} -> {values['work']}"
-                else:
-                    path = f"{values['work']} -> {values['home']}"
-                ds += f"    {values['time']} : {path}\n"
+        shifts = {"day": "dia", "night": "noite"}
+        last = None
+        for ride in self._daily_schedule.values():
+            if ride.day != last:
+                ds += f"{week[ride.weekday]} {ride.day.strftime(r'%d/%m/%y')}"
+                ds += f" ({shifts[ride.shift]})\n" if self.rotation else "\n"
+                last = ride.day
+            ds += f"    {ride.time} : {ride.origin} -> {ride.destination}\n"
         return (
-            f"Turno '%s' começando no dia '%s' com duração de '%i' dias.\n" % (self.shift,
-                                                                               self.start_day,
-                                                                               self.days) + 
+            f"%s '%s' começando no dia '%s' com duração de '%i' dias.\n" % (
+                *(["Escala", self.rotation.upper()] if self.rotation else ["Turno", self.shift]),
+                self.start_day,
+                self.days) + 
                 f"Endereços cadastrados:\n%s\n" % (self.get_addresses()) +
                 f"Agenda:\n%s\n" % (ds)
         )
@@ -210,7 +1136,8 @@ class Mobicity:
     @start_day.setter
     def start_day(self, day:str):
         if isinstance(day, str):
-            self._start_day = date(*list(map(int, day.split("/")))[::-1])
+            self._start_day = _parse_date(day)
+            self._stale = True
     
     @property
     def days(self):
@@ -219,8 +1146,26 @@ class Mobicity:
     
     @days.setter
     def days(self, n_days:int=6):
-        if n_days <= 6:
-            self._days = n_days
+        if n_days < 1:
+            raise ValueError("A escala deve ter pelo menos 1 dia")
+        self._days = n_days
+        self._stale = True
+
+    @property
+    def rotation(self) -> str:
+        """Escala de revezamento, como "3D+3N", "7D+7F" ou "14x14"; vazio para turno único"""
+        return self._rotation
+
+    @rotation.setter
+    def rotation(self, rotation:str):
+        _parse_rotation(rotation, self.shift)
+        self._rotation = rotation
+        self._stale = True
+
+    @property
+    def cycle(self) -> tuple:
+        """Turno de cada dia de um ciclo da escala, `None` nas folgas"""
+        return _parse_rotation(self.rotation, self.shift)
     
     @property
     def shift(self):
@@ -233,29 +1178,38 @@ class Mobicity:
             raise ValueError("Turno deve ser um valor dentre ['day', 'night']")
         else:
             self._shift = shift.lower()
+            self._stale = True
     
     @property
     def time_to_work(self):
-        """Horário de ida para o trabalho no formato "HH:MM"."""
+        """Horário de ida para o trabalho no formato "HH:MM", ou um por turno {"day": ..., "night": ...}."""
         return self._default_time_to_work
     
     @time_to_work.setter
     def time_to_work(self, to_work):
-        i, j = to_work.split(":")
-        if len(i) == 2 and len(j) == 2 and int(i) < 24 and int(j) < 60:
+        if all(map(_valid_time, to_work.values() if isinstance(to_work, dict) else [to_work])):
             self._default_time_to_work = to_work
     
     @property
     def time_to_home(self):
-        """Horário de ida para casa no formato "HH:MM"."""
+        """Horário de ida para casa no formato "HH:MM", ou um por turno {"day": ..., "night": ...}."""
         return self._default_time_to_home
     
     @time_to_home.setter
     def time_to_home(self, to_home):
-        i, j = to_home.split(":")
-        if len(i) == 2 and len(j) == 2 and int(i) < 24 and int(j) < 60:
+        if all(map(_valid_time, to_home.values() if isinstance(to_home, dict) else [to_home])):
             self._default_time_to_home = to_home
 
+    def _shift_time(self, way:str, shift:str) -> str:
+        """Horário padrão do sentido `way` no turno `shift`"""
+        time = getattr(self, "time_" + way)
+        return time.get(shift, "") if isinstance(time, dict) else time
+
+    def _day_shift(self, day:date) -> str:
+        """Turno do dia `day` pela escala, `None` nas folgas"""
+        cycle = self.cycle
+        return cycle[(day - self.start_day).days % len(cycle)]
+
     def set_address(self, name:str, address:str):
         """
         Adiciona um endereço à lista
@@ -312,7 +1266,7 @@ class Mobicity:
 
 
     def setup_schedule_weekdays(self, way:str, weekdays:list=[0, 1, 2, 3, 4, 5, 6],
-                                work:str="", home:str="", time:str=""):
+                                work:str="", home:str="", time:str="", shift:str=""):
         """
         Define agendamentos com particularidades por pelos dias da semana
 
@@ -328,45 +1282,94 @@ class Mobicity:
             Nome do endereço de casa.
         time : str, default ""
             Horário de partida.
+        shift : str, default ""
+            Turno ajustado, `day` ou `night`. Vazio ajusta os dois turnos.
         """
+        if shift and shift not in ["day", "night"]:
+            raise ValueError("Turno deve ser um valor dentre ['day', 'night']")
         for i in weekdays:
             if i not in range(7):
                 raise ValueError("Existem valores dentro da lista de dias da semana quanão estão entre 0 e 6")
 
-            self._setup_schedule_weekday(way, i, work, home, time)
-
-        self.setup_schedule()
+            for s in [shift] if shift else ["day", "night"]:
+                self._setup_schedule_weekday(way, i, work, home, time, s)
 
     def _setup_schedule_weekday(self, way:str, weekday,
-                                work:str="", home:str="", time:str=""):
+                                work:str="", home:str="", time:str="", shift:str="day"):
         # Ajusta para o padrão 'home' e 'work' caso não seja definido pelo usuário
         work = work if work else 'work'
         home = home if home else 'home'
-        time = time if time else getattr(self, "time_" + way)
+        time = time if time else self._shift_time(way, shift)
 
-        if weekday not in range(7):
-            raise ValueError("Existem valores dentro da lista de dias da semana quanão estão entre 0 e 6") 
-        if weekday not in self._week_schedule:
-            self._week_schedule[weekday] = {"to_work": dict(), "to_home": dict()}
-
-        self._week_schedule[weekday][way] = {
-            "home": home,
-            "work": work,
-            "time": time
-        }
+        rule = WeekRule(shift, weekday, way, home, work, time)
+        key = (shift, weekday, way)
+        if self._week_schedule.get(key) != rule:
+            self._week_schedule[key] = rule
+            self._dirty.add(key)
 
     def setup_schedule(self):
         """
-        Ajusta a escala completa utilizando as parametrizações passadas
+        Ajusta a escala completa utilizando as parametrizações passadas, pulando as
+        folgas da escala de revezamento
+
+        A agenda é refeita na próxima leitura, mantendo os ajustes do `setup_schedule_ride`.
+        """
+        self._stale = True
+
+    @property
+    def _daily_schedule(self) -> dict:
+        """
+        Agenda `{(dia, sentido): Ride}` atualizada: refeita por inteiro se a escala mudou
+        ou somente nas viagens das regras alteradas desde a última leitura
         """
-        for i in range(self.days):
-            day = self.start_day + timedelta(days=i)
-            self.setup_schedule_ride(day=day, way="to_work")
-            self.setup_schedule_ride(day=day, way="to_home")
+        if self._stale:
+            self._rides, self._rides_by_rule = dict(), dict()
+            for i in range(self.days):
+                day = self.start_day + timedelta(days=i)
+                off = self._day_shift(day) is None
+                for way in ["to_work", "to_home"]:
+                    # Numa folga só entram as viagens ajustadas pelo usuário
+                    if not off or (day, way) in self._overrides:
+                        self._add_ride(self._build_ride(day, way))
+            self._stale, self._columns = False, None
+            self._dirty.clear()
+        elif self._dirty:
+            for rule_key in self._dirty:
+                for key in self._rides_by_rule.get(rule_key, []):
+                    self._rides[key] = self._build_ride(*key)
+            self._columns = None
+            self._dirty.clear()
+        return self._rides
+
+    def _add_ride(self, ride:Ride):
+        """Inclui a viagem na agenda e no índice da regra da semana que ela usa"""
+        self._rides[(ride.day, ride.way)] = ride
+        self._rides_by_rule.setdefault((ride.shift, ride.weekday, ride.way), []).append((ride.day, ride.way))
+
+    def _build_ride(self, day:date, way:str, override:dict=None) -> Ride:
+        """
+        Monta a viagem pela regra da semana do turno do dia e pelos ajustes do usuário
+        (`override`, ou os guardados em `_overrides`)
+        """
+        # Turno do dia pela escala; numa folga vale o turno padrão
+        shift = self._day_shift(day) or self._shift or "day"
+        rule = self._week_schedule[(shift, day.weekday(), way)]
+        if override is None:
+            override = self._overrides.get((day, way), {})
+        return Ride(day,
+                    way,
+                    override.get("time") or rule.time,
+                    override.get("home") or rule.home,
+                    override.get("work") or rule.work,
+                    shift)
     
     def setup_schedule_ride(self, day:str, way:str, work:str="", home:str="", time:str=""):
         """
         Ajusta uma viagem
+
+        O ajuste é mantido quando as regras da semana mudam depois. Chamado sem `work`,
+        `home` e `time`, devolve a viagem ao padrão da semana. Numa folga o ajuste inclui
+        a viagem na agenda; fora da duração da escala ele fica guardado, sem efeito.
         
         Parameters:
         -----------
@@ -381,34 +1384,36 @@ class Mobicity:
             Horário da viagem.
         """
         if isinstance(day, str):
-            day = date(*list(map(int, day.split("/")))[::-1])
-        # se turno da noite e ida para casa, será no dia seguinte
-        dayafter = 1 if self._shift == "night" and way == "to_home" else 0
-        
-        stringday = (day + timedelta(days=dayafter)).strftime(r"%d/%m/%y")
-        
-        weekday = day.weekday()
-        default_work = self._week_schedule[weekday][way]["work"]
-        default_home = self._week_schedule[weekday][way]["home"]
-        default_time = self._week_schedule[weekday][way]["time"]
-
-        work = work if work else default_work
-        home = home if home else default_home
-        time = time if time else default_time
-                
-        if day not in self._daily_schedule:
-            self._daily_schedule[day] = {"to_work": dict(), "to_home": dict()}
-        
-        self._daily_schedule[day][way] = {"day": stringday,
-                                          "weekday": weekday,
-                                          "time": time,
-                                          "home": home,
-                                          "work": work}
+            day = _parse_date(day)
+        key = (day, way)
+        override = {k: v for k, v in [("work", work), ("home", home), ("time", time)] if v}
+        # Monta a viagem antes de guardar o ajuste, para que um horário inválido não fique gravado
+        ride = self._build_ride(day, way, override)
+        if override:
+            self._overrides[key] = override
+        else:
+            self._overrides.pop(key, None)
+
+        if self._stale:
+            return
+        within = self.start_day <= day < self.start_day + timedelta(days=self.days)
+        if not within or (not override and self._day_shift(day) is None):
+            # A viagem não pertence à agenda (ou deixou de pertencer), refeita na próxima leitura
+            self._stale = key in self._rides
+        elif key in self._rides:
+            self._rides[key] = ride
+        else:
+            # Viagem nova numa folga: refeita na próxima leitura, para entrar na ordem das datas
+            self._stale = True
+        self._columns = None
     
     def _checkup(self):
         error_list = []
 
         for item in self._checkup_tags:
+            # Na escala de revezamento o turno de cada dia vem da própria escala
+            if item == "shift" and self.rotation:
+                continue
             if not getattr(self, item):
                 error_list.append(item)
         
@@ -416,7 +1421,9 @@ class Mobicity:
             raise ValueError("Os seguintes atributos devem ser configurados:" +
                              str(error_list))
 
-    def setup_rides(self, email:str, password:str, verbose:bool=False):
+    def setup_rides(self, email:str, password:str, verbose:bool=False, workers:int=1,
+                    reconcile:bool=False, backend:str="browser", trace:str="",
+                    progress=None, dates=None, warm=None, journal=False) -> list:
         """
         Inicia os agendamentos
 
@@ -431,27 +1438,314 @@ class Mobicity:
             Senha do Mobicity.
         verbose : bool, default False
             Indica se a aplicação deve imprimir os passos no terminal.
+        workers : int, default 1
+            Número de navegadores abertos em paralelo. Cada um faz o seu próprio
+            login e retira da fila a próxima viagem assim que termina a anterior.
+            Se um login (ou o novo login depois de uma sessão caída) falhar, a viagem
+            em andamento falha com esse erro e o navegador para; as viagens que
+            sobrarem na fila, sem nenhum navegador para enviá-las, falham com o mesmo erro.
+        reconcile : bool, default False
+            Lê uma vez as corridas já agendadas no painel e envia somente as que faltam.
+            Ao final confere, com uma nova leitura, se as enviadas constam no painel. Se a
+            leitura falhar, avisa e envia todas as viagens, sem a conferência final.
+        backend : str, default "browser"
+            Meio de agendamento: "browser" preenche o painel pelo navegador e "http"
+            conversa diretamente com a API do painel, sem renderizar a página. A API do
+            "http" foi suposta e não verificada no painel real (`_api_map`), então ele só
+            roda contra o painel local (`mock_dashboard`) e levanta ValueError no real.
+        trace : str, default ""
+            Arquivo onde gravar a duração de cada etapa do login e das corridas, no formato
+            de trace do Chrome. Ao final é impresso o resumo do tempo gasto por etapa.
+        progress : callable, default None
+            Chamada como `progress(dia, sentido, situação)` a cada viagem concluída, sendo a
+            situação "Ok.", "Já agendada." ou a exceção. Com `workers` maior que 1 é chamada
+            das threads de agendamento.
+        dates : iterable, default None
+            Agenda apenas as viagens dessas datas (datetime.date); `None` agenda todas.
+        warm : list, default None
+            Sessões do mesmo backend já logadas pelo `warm_up`, usadas antes de abrir novas.
+            São fechadas ao final, como as demais.
+        journal : bool or str, default False
+            Registra a situação de cada viagem num diário SQLite (`True` usa o arquivo
+            journal.sqlite3 da pasta de cache, ou informe o caminho). As viagens que o
+            diário já dá como agendadas, com os mesmos dados, não são enviadas de novo, de
+            forma que uma execução interrompida é retomada de onde parou. Com `reconcile`
+            quem decide é o painel: uma viagem agendada no diário que não aparece na
+            leitura é enviada de novo.
+
+        Returns:
+        --------
+        list
+            Lista de tuplas `(dia, sentido, erro)` na ordem da agenda, sendo `erro`
+            igual a `None` para as viagens agendadas com sucesso. As falhas conhecidas vêm
+            como RideError (AlreadyBooked, TooLate, SelectorMissing, RideTimeout,
+            SessionLost, RideNotConfirmed); as passageiras são tentadas de novo até
+            `retries` vezes antes de chegarem aqui.
         """
         self._checkup()
 
         verbose = print if verbose else lambda *x, sep="", end="": x
+        login, setup_ride, scheduled_rides, kill = self._backend(backend)
+        self._tracer = _Tracer() if trace else None
+
+        rides = [ride for ride in self._daily_schedule.values() if dates is None or ride.date in dates]
+        results = [None] * len(rides)
+        if journal:
+            journal = _Journal(journal if isinstance(journal, str) else os.path.join(_CACHE_DIR, "journal.sqlite3"))
+
+        def record(i, state, error=None):
+            if journal:
+                journal.mark(email, rides[i].day, rides[i].way, state, error)
+        # Prazo das esperas de cada tentativa de viagem: sem prazo enquanto não há viagens
+        # medidas, e nunca menor que uma espera padrão
+        budget = self.ride_budget or _learned_timeout("ride." + backend, default=0,
+                                                      minimum=_WAIT_DEFAULT, maximum=float("inf"))
+
+        # Sessões já logadas e livres, reaproveitadas entre a leitura e os envios
+        sessions = Queue()
+        opened = list(warm or [])
+        for browser in opened:
+            sessions.put(browser)
+
+        def session():
+            try:
+                return sessions.get_nowait()
+            except Empty:
+                with self._span("login"):
+                    browser = login(email, password)
+                opened.append(browser)
+                return browser
 
-        self._browser_login(email, password)
+        def relogin(browser):
+            # A sessão caiu: descarta e abre outra no lugar
+            opened.remove(browser)
+            try:
+                kill(browser)
+            except Exception:
+                pass
+            with self._span("login"):
+                browser = login(email, password)
+            opened.append(browser)
+            return browser
 
-        for day, values in self._daily_schedule.items():
-            for way, values in values.items():
-                verbose(day, "indo para", "trabalho." if way == "to_work" else "casa.    ", end=" ")
+        def read_scheduled():
+            """Corridas agendadas no painel, ou None se o login ou a leitura falhar"""
+            try:
+                browser = session()
+            except Exception as e:
+                lost.append(_ride_error(e))
+                return None
+            try:
+                with self._span("reconcile"):
+                    return scheduled_rides(browser)
+            except Exception as e:
+                import warnings
+                warnings.warn("Falha na leitura das corridas agendadas no painel (%s), "
+                              "enviando todas as viagens" % _ride_error(e), stacklevel=3)
+                return None
+            finally:
+                sessions.put(browser)
+
+        def report(i, status):
+            ride = rides[i]
+            verbose(ride.day, "indo para", "trabalho." if ride.way == "to_work" else "casa.    ", status)
+            if progress:
+                progress(ride.day, ride.way, status)
+
+        # Falha do novo login de um trabalhador, que então para; repassada às viagens
+        # que ficarem na fila sem nenhum trabalhador para enviá-las
+        lost = []
+
+        def worker():
+            try:
+                browser = session()
+            except Exception as e:
+                lost.append(_ride_error(e))
+                return
+            try:
+                while browser is not None:
+                    try:
+                        i = queue.get_nowait()
+                    except Empty:
+                        break
+                    ride = rides[i]
+                    record(i, "in-flight")
+                    for attempt in range(self.retries + 1):
+                        try:
+                            start = perf_counter()
+                            with self._span("ride", day=ride.label, way=ride.way), _deadline(budget):
+                                setup_ride(browser,
+                                           ride.label,
+                                           ride.time,
+                                           ride.way,
+                                           ride.home,
+                                           ride.work)
+                            _record_wait("ride." + backend, perf_counter() - start)
+                            results[i], status = None, "Ok."
+                            break
+                        except Exception as e:
+                            error = _ride_error(e)
+                            results[i], status = error, error
+                            # Falhas definitivas (já agendada, tempo anterior, ...) não se repetem
+                            if not getattr(error, "retry", None) or attempt == self.retries:
+                                break
+                            verbose(ride.day, "indo para", "trabalho." if ride.way == "to_work" else "casa.    ",
+                                    error, "Tentando de novo.")
+                            if error.retry == "login":
+                                try:
+                                    browser = relogin(browser)
+                                except Exception as e:
+                                    # Sem sessão a viagem falha com o erro do login e o trabalhador para
+                                    browser, results[i] = None, _ride_error(e)
+                                    status = results[i]
+                                    lost.append(results[i])
+                                    break
+                            with self._span("retry", reason=type(error).__name__):
+                                sleep(_RETRY_BACKOFF * 2 ** attempt)
+                    # Já agendada conta como agendada no diário: pode ser o envio de uma
+                    # execução interrompida antes da resposta
+                    if results[i] is None or isinstance(results[i], AlreadyBooked):
+                        record(i, "booked", results[i])
+                    else:
+                        record(i, "failed", results[i])
+                    report(i, status)
+            finally:
+                if browser is not None:
+                    sessions.put(browser)
+
+        try:
+            pending = list(range(len(rides)))
+            if journal:
+                booked = journal.plan(email, {(ride.day, ride.way): self._ride_key(ride) for ride in rides})
+                # Com a leitura do painel o diário não basta: uma corrida cancelada no painel
+                # depois de agendada precisa ser enviada de novo
+                if not reconcile:
+                    done = [i for i in pending if (rides[i].day, rides[i].way) in booked]
+                    pending = [i for i in pending if (rides[i].day, rides[i].way) not in booked]
+                    for i in done:
+                        report(i, "Já agendada.")
+            scheduled = read_scheduled() if reconcile and pending else None
+            if scheduled is not None:
+                done = [i for i in pending if self._is_scheduled(rides[i], scheduled)]
+                pending = [i for i in pending if not self._is_scheduled(rides[i], scheduled)]
+                for i in done:
+                    record(i, "booked")
+                    report(i, "Já agendada.")
+
+            queue = Queue()
+            for i in pending:
+                queue.put(i)
+
+            # Sem login para a leitura do painel, o envio também não tem sessão
+            workers = min(max(1, workers), len(pending)) if not lost else 0
+            if workers == 1:
+                worker()
+            elif workers > 1:
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    for future in [pool.submit(worker) for _ in range(workers)]:
+                        future.result()
+
+            # Nenhuma sessão restou (falhou o login da leitura ou o de todos os trabalhadores):
+            # o que sobrou na fila falha com o mesmo erro
+            while lost:
                 try:
-                    self._browser_setup_ride(values["day"],
-                                             values["time"],
-                                             way,
-                                             values["home"],
-                                             values["work"])
-                    verbose("Ok.")
-                except Exception as e:
-                    verbose(e)
+                    i = queue.get_nowait()
+                except Empty:
+                    break
+                results[i] = lost[-1]
+                record(i, "failed", results[i])
+                report(i, results[i])
 
-        self._browser_kill()
+            # Sem a primeira leitura ou sem sessão aberta depois de um login que falhou, a
+            # conferência final fica de fora
+            if scheduled is not None and pending and not (lost and sessions.empty()):
+                scheduled = read_scheduled()
+                for i in pending if scheduled is not None else []:
+                    if results[i] is None and not self._is_scheduled(rides[i], scheduled):
+                        results[i] = RideNotConfirmed("Corrida não encontrada no painel")
+                        record(i, "failed", results[i])
+                        report(i, results[i])
+        finally:
+            for browser in opened:
+                kill(browser)
+            if journal:
+                journal.close()
+            _save_waits()
+            if self._tracer:
+                self._tracer.export(trace)
+                print(self._tracer.summary())
+                self._tracer = None
+
+        return [(ride.day, ride.way, results[i]) for i, ride in enumerate(rides)]
+
+    def warm_up(self, email:str, password:str, workers:int=1, backend:str="browser") -> list:
+        """
+        Abre e loga `workers` sessões com antecedência, em paralelo
+
+        As sessões retornadas são passadas ao `setup_rides(warm=...)`, que começa a agendar
+        sem esperar navegador, driver e login. Se algum login falhar, as sessões já abertas
+        são fechadas e o erro é levantado.
+        """
+        login, _, _, kill = self._backend(backend)
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            futures = [pool.submit(login, email, password) for _ in range(max(1, workers))]
+        warm, errors = [], []
+        for future in futures:
+            try:
+                warm.append(future.result())
+            except Exception as e:
+                errors.append(e)
+        if errors:
+            for session in warm:
+                kill(session)
+            raise errors[0]
+        return warm
+
+    def _span(self, name:str, **args):
+        """Mede a etapa `name` quando o setup_rides roda com trace"""
+        return self._tracer.span(name, **args) if self._tracer else nullcontext()
+
+    def _backend(self, name:str) -> tuple:
+        """
+        Retorna as funções `(login, setup_ride, scheduled_rides, kill)` do backend `name`
+        """
+        if name not in ["browser", "http"]:
+            raise ValueError("Backend deve ser um valor dentre ['browser', 'http']")
+        if name == "http":
+            self._check_api()
+        return tuple(getattr(self, "_%s_%s" % (name, step))
+                     for step in ["login", "setup_ride", "scheduled_rides", "kill"])
+
+    def _check_api(self):
+        """Recusa a API do painel real (`_api_map`), que não foi verificada"""
+        if self._link_api == Mobicity._link_api:
+            raise ValueError("A API do painel real não foi verificada (veja Mobicity._api_map): o backend "
+                             "'http' e a API assíncrona só rodam contra o painel local (mock_dashboard)")
+
+    def _ride_key(self, ride:Ride) -> tuple:
+        """
+        Chave `(data, horário, origem, destino)` de uma viagem com os endereços como
+        cadastrados, usada pelo diário para perceber uma viagem alterada
+        """
+        return (ride.date,
+                ride.time,
+                _normalize_address(getattr(self, ride.origin)),
+                _normalize_address(getattr(self, ride.destination)))
+
+    def _is_scheduled(self, ride:Ride, scheduled:set) -> bool:
+        """
+        Indica se a viagem consta nas corridas `scheduled` lidas do painel
+
+        O painel mostra o texto da sugestão escolhida, não o endereço digitado, então vale
+        também a chave com a sugestão guardada no cache de endereços, quando houver.
+        """
+        key = self._ride_key(ride)
+        if key in scheduled:
+            return True
+        shown = [_cached_place(getattr(self, name)) for name in [ride.origin, ride.destination]]
+        shown = [_normalize_address(place["description"]) if place and place.get("description") else address
+                 for place, address in zip(shown, key[2:])]
+        return (*key[:2], *shown) in scheduled
 
     @property
     def browser_name(self) -> str:
@@ -465,56 +1759,140 @@ class Mobicity:
         else:
             self._browser_name = "firefox"
 
+    @property
+    def lean(self) -> bool:
+        """
+        Indica se o navegador roda no modo enxuto: sem janela, sem GPU e sem extensões.
+        No Edge, que no selenium fixado não recebe opções, vale só o carregamento "eager"
+        e a janela de tamanho fixo.
+        """
+        return self._lean
+
+    @lean.setter
+    def lean(self, lean:bool):
+        self._lean = bool(lean)
+
+    @property
+    def keep_session(self) -> bool:
+        """
+        Indica se os cookies e o localStorage do login são guardados (criptografados com
+        a senha) para que as próximas execuções pulem o formulário de login
+        """
+        return self._keep_session
+
+    @keep_session.setter
+    def keep_session(self, keep:bool):
+        self._keep_session = bool(keep)
+
+    @property
+    def driver_path(self) -> str:
+        """
+        Caminho de um WebDriver local fixo. Quando definido, o login não consulta versões
+        nem baixa drivers, permitindo rodar sem acesso à internet. Sem caminho definido,
+        vale o da variável de ambiente MOBICITY_DRIVER, conferido somente no login.
+        """
+        return self._driver_path or os.environ.get("MOBICITY_DRIVER", "")
+
+    @driver_path.setter
+    def driver_path(self, path:str):
+        if path and not os.path.isfile(path):
+            raise ValueError("WebDriver '%s' não encontrado" % path)
+        self._driver_path = path
+
     def _browser_login(self, email:str, password:str):
         """
-        Inicia o browser com o login de usuário
+        Inicia o browser com o login de usuário e retorna a instância do WebDriver
         """
 
-        Browser, Options, DriverManager = _import_webdriver(self.browser_name)
-        options = Options()
-        # chrome_options.add_argument('--headless')
-        # options.add_argument('--log-level=3')
-        
-        executable_path = DriverManager().install()
-        # executable_path = executable_path if ".exe" not in executable_path else _os.path.split(executable_path)[0]
+        from selenium.webdriver.common.keys import Keys
 
-        self._browser = Browser(executable_path) #, options=options)
-        # self._browser = Browser() #, options=options)
-        browser = self._browser
-        browser.maximize_window()
+        # Navegador aberto com antecedência pelo `prelaunch`, já na página de login
+        with self._span("login.prelaunch"):
+            browser = _take_prelaunched(self.browser_name, self.lean, self.driver_path, self._link_mobicity)
+        if browser is None:
+            with self._span("login.launch"):
+                browser = _launch_browser(self.browser_name, self.lean, self.driver_path, self._span)
+            with self._span("login.page"):
+                browser.get(self._link_mobicity)
+        if self.keep_session:
+            with self._span("login.session"):
+                if self._browser_restore_session(browser, email, password):
+                    return browser
+
+        with self._span("login.form"):
+            elem = _wait(browser, _present("username"))
+            #login
+            elem.send_keys(email)
+            elem.send_keys(Keys.ENTER)
+            elem = _wait(browser, _present("password"))
+            elem.send_keys(password)
+            elem.send_keys(Keys.ENTER)
+            # O login termina quando o formulário de senha sai da página
+            _wait(browser, _absent("password"))
+
+        if self.keep_session:
+            _save_session(email, password, {
+                "cookies": browser.get_cookies(),
+                "local_storage": browser.execute_script("return Object.assign({}, window.localStorage);")
+            })
+        return browser
+
+    def _browser_restore_session(self, browser, email:str, password:str) -> bool:
+        """
+        Aplica a sessão guardada ao navegador, que já deve estar no domínio do Mobicity
+
+        Retorna `True` se a sessão ainda é válida, ou seja, se a página de agendamento abre
+        sem pedir login. Caso contrário o navegador volta para a página de login.
+        """
+        state = _load_session(email, password)
+        if not state:
+            return False
+
+        for cookie in state["cookies"]:
+            browser.add_cookie({k: v for k, v in cookie.items()
+                                if k in ["name", "value", "path", "domain", "secure", "httpOnly", "expiry"]})
+        browser.execute_script(
+            "for (const [k, v] of Object.entries(arguments[0])) { window.localStorage.setItem(k, v); }",
+            state["local_storage"]
+        )
+
+        browser.get(self._link_ride_request)
+        outcome, _ = _wait_any(browser, expired=_present("username"), valid=_present("date"))
+        if outcome == "valid":
+            return True
+
+        # Sessão expirada, segue para o login completo
+        browser.delete_all_cookies()
+        browser.execute_script("window.localStorage.clear();")
+        browser.get(self._link_mobicity)
+        return False
+
+    def _browser_setup_ride(self, browser, day:str, time:str, way:str, home:str, work:str):
+        from selenium.common.exceptions import NoAlertPresentException
+        from selenium.webdriver.common.keys import Keys
 
-        browser.get(Mobicity._link_mobicity)
-        elem = WebDriverWait(browser, 30).until(lambda x: x.find_element(*Mobicity._site_map["username"]))
-        #login
-        elem.send_keys(email)
-        elem.send_keys(Keys.ENTER)
-        elem = WebDriverWait(browser, 30).until(lambda x: x.find_element(*Mobicity._site_map["password"]))
-        elem.send_keys(password)
-        elem.send_keys(Keys.ENTER)
-        sleep(5)
-
-    def _browser_setup_ride(self, day:str, time:str, way:str, home:str, work:str):
-        browser = self._browser
         _date = day
         _time = time
         _from = getattr(self, home) if way == "to_work" else getattr(self, work)
         _to = getattr(self, work) if way == "to_work" else getattr(self, home)
 
-        browser.get(Mobicity._link_ride_request)
+        with self._span("ride.page"):
+            browser.get(self._link_ride_request)
 
-        try:
-            browser.switch_to.alert.accept()
-        except Exception as e:
-            pass
+            try:
+                browser.switch_to.alert.accept()
+            except NoAlertPresentException:
+                pass
         
 
         # Configuração inicial
-        elem = WebDriverWait(browser, 30).until(lambda x: x.find_element(*Mobicity._site_map["date"]))
-        elem.clear()
-        elem.send_keys(_date, Keys.ESCAPE)
-        elem = browser.find_element(*Mobicity._site_map["hour"])
-        elem.clear()
-        elem.send_keys(_time, Keys.ESCAPE)
+        with self._span("ride.date"):
+            elem = _wait(browser, _present("date"))
+            elem.clear()
+            elem.send_keys(_date, Keys.ESCAPE)
+            elem = _find(browser, "hour")
+            elem.clear()
+            elem.send_keys(_time, Keys.ESCAPE)
 
         # Zoom out
         # html = browser.find_element(By.TAG_NAME, "html")
@@ -525,60 +1903,589 @@ class Mobicity:
         # permitia clicar no endereço escolhido. 18/04
         browser.execute_script('document.querySelector("#scrollable").style.fontSize = "9px"')
 
-        browser.find_element(*Mobicity._site_map["from_field"]).send_keys(_from)
-        WebDriverWait(browser, 30).until(lambda x: x.find_element(*Mobicity._site_map["from_click"])).click()
-        browser.find_element(*Mobicity._site_map["to_field"]).send_keys(_to)
-        WebDriverWait(browser, 30).until(lambda x: x.find_element(*Mobicity._site_map["to_click"])).click()
-        sleep(2)
-        # Avançar
-        browser.execute_script(
-            "arguments[0].click();",
-            browser.find_element(*Mobicity._site_map["forward_setup"])
+        with self._span("ride.from"):
+            self._browser_pick_place(browser, "from_field", "from_click", _from)
+        with self._span("ride.to"):
+            self._browser_pick_place(browser, "to_field", "to_click", _to)
+            # O endereço foi aceito quando a lista de sugestões fecha
+            _wait(browser, _absent("to_click"))
+
+        with self._span("ride.forward"):
+            # Avançar
+            browser.execute_script(
+                "arguments[0].click();",
+                _find(browser, "forward_setup")
+            )
+
+            # Tempo anterior ou segue para a justificativa, o que aparecer primeiro
+            outcome, elem = _wait_any(browser,
+                                      before_time=_present_text("atention_before_time", "Atenção!"),
+                                      justify=_present("justify"))
+        if outcome == "before_time":
+            raise TooLate("Tempo anterior")
+
+        with self._span("ride.justify"):
+            # Justifica Turno
+            elem.send_keys("Turno")
+            # O ENTER só seleciona a justificativa depois que o react-select destaca a opção
+            _wait(browser, _present("justify_option"))
+            elem.send_keys(Keys.ENTER)
+            # e a seleção é confirmada quando a lista de opções fecha
+            _wait(browser, _absent("justify_option"))
+            browser.execute_script(
+                "arguments[0].click();",
+                _find(browser, "forward_justify")
+            )
+        
+        with self._span("ride.outcome"):
+            # Já há corrida agendada, achou motorista ou já concluiu?
+            outcome, elem = _wait_any(browser,
+                                      booked=_present_text("atention", "Atenção!"),
+                                      conclude=_present("forward_conclude"),
+                                      finish=_present("finish"))
+        if outcome == "booked":
+            raise AlreadyBooked("Corrida já agendada")
+
+        if outcome == "conclude":
+            with self._span("ride.conclude"):
+                # O botão fica obscurecido algumas vezes
+                elem.click()
+                # Aguardada a mensagem de agendada
+                _wait(browser, _present("finish"))
+    
+    def _browser_pick_place(self, browser, field:str, click:str, address:str):
+        """
+        Digita `address` no campo `field` e escolhe a sugestão `click`
+
+        O formulário só aceita uma sugestão escolhida na lista. Com o endereço no cache,
+        a escolhida é a sugestão de mesmo texto da última vez, mesmo que o painel a mostre
+        em outra posição; sem ela na lista, vale a primeira sugestão, que passa a ser a
+        guardada (junto com o place_id usado pelo backend "http").
+        """
+        cached = _cached_place(address)
+        _find(browser, field).send_keys(address)
+        if cached and cached.get("description"):
+            _, elem = _wait_any(browser,
+                                match=_present_text(click, cached["description"]),
+                                first=_present(click))
+        else:
+            elem = _wait(browser, _present(click))
+        text = elem.text.strip()
+        elem.click()
+        if text and (cached is None or cached.get("description") != text):
+            _store_place(address, {"description": text})
+
+    def _browser_scheduled_rides(self, browser) -> set:
+        """
+        Lê as corridas já agendadas no painel do usuário
+
+        Returns:
+        --------
+        set
+            Chaves `(data, horário, origem, destino)`, no mesmo formato de `_ride_key`.
+        """
+        browser.get(self._link_rides)
+        _wait(browser, _present("scheduled_table"))
+        # Lê todas as células numa única chamada ao navegador
+        rows = browser.execute_script(
+            "return arguments[0].map(r => Array.from(r.querySelectorAll('td'), td => td.innerText.trim()));",
+            _find_all(browser, "scheduled_rides")
         )
+        scheduled = set()
+        for row in rows:
+            values = dict(zip(Mobicity._scheduled_columns, row))
+            try:
+                scheduled.add((_parse_date(values["date"]),
+                               values["time"][:5],
+                               _normalize_address(values["from"]),
+                               _normalize_address(values["to"])))
+            except (KeyError, ValueError):
+                # Linha que não é uma corrida (cabeçalho, aviso, etc.)
+                continue
+        return scheduled
+
+    def _browser_kill(self, browser):
+        browser.quit()
 
-        # Tempo anterior
-        before_time = False
+    def _http_request(self, session, step:str, **kwargs):
+        """Chama o endpoint `step` do `_api_map` e retorna a resposta"""
+        method, path = self._api_map[step]
+        return session.request(method, self._link_api + path, timeout=30, **kwargs)
+
+    def _http_login(self, email:str, password:str):
+        """
+        Faz o login na API do painel e retorna uma sessão HTTP autenticada
+
+        A sessão mantém as conexões abertas (keep-alive) e é reaproveitada por todas
+        as viagens enviadas por ela.
+        """
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+
+        with self._span("login.form"):
+            response = self._http_request(session, "login", json={"email": email, "password": password})
+        if response.status_code in [401, 403]:
+            session.close()
+            raise ValueError("Usuário ou senha inválidos")
+        response.raise_for_status()
+        session.headers["Authorization"] = "Bearer " + response.json()["token"]
+        return session
+
+    def _http_place(self, session, address:str, cached:bool=True) -> dict:
+        """
+        Resolve um endereço na busca do painel, ficando com a primeira sugestão
+
+        A sugestão com place_id fica no cache de endereços, e as próximas viagens (desta e
+        das próximas execuções) não repetem a busca. Com `cached` False a busca é refeita.
+        """
+        place = _cached_place(address) if cached else None
+        if place and "place_id" in place:
+            return place
+        with self._span("ride.address"):
+            response = self._http_request(session, "address", params={"input": address})
+        if response.status_code == 401:
+            raise SessionLost("Sessão expirada")
+        response.raise_for_status()
+        places = response.json()
+        if not places:
+            raise ValueError("Endereço não encontrado: '%s'" % address)
+        _store_place(address, places[0])
+        return places[0]
+
+    def _http_setup_ride(self, session, day:str, time:str, way:str, home:str, work:str):
+        _from = getattr(self, home) if way == "to_work" else getattr(self, work)
+        _to = getattr(self, work) if way == "to_work" else getattr(self, home)
+
+        for cached in [True, False]:
+            origin = self._http_place(session, _from, cached)
+            destination = self._http_place(session, _to, cached)
+            with self._span("ride.request"):
+                response = self._http_request(session, "ride", json={
+                    "date": day,
+                    "time": time,
+                    "origin": origin,
+                    "destination": destination,
+                    "justification": "Turno"
+                })
+            # Endereço recusado: a sugestão guardada não vale mais, busca de novo
+            if response.status_code != 400:
+                break
+            _store_place(_from)
+            _store_place(_to)
+        if response.status_code == 401:
+            raise SessionLost("Sessão expirada")
+        if response.status_code == 409:
+            raise AlreadyBooked("Corrida já agendada")
+        if response.status_code == 422:
+            raise TooLate("Tempo anterior")
+        response.raise_for_status()
+
+    def _http_scheduled_rides(self, session) -> set:
+        """Lê as corridas já agendadas pela API, no mesmo formato de `_ride_key`"""
+        response = self._http_request(session, "rides")
+        response.raise_for_status()
+        return {(_parse_date(ride["date"]),
+                 ride["time"][:5],
+                 _normalize_address(ride["origin"]["description"]),
+                 _normalize_address(ride["destination"]["description"]))
+                for ride in response.json()}
+
+    def _http_kill(self, session):
+        session.close()
+
+    def _async_request(self, session, step:str, **kwargs):
+        """Versão assíncrona do `_http_request`, para uso com `async with`"""
+        method, path = self._api_map[step]
+        return session.request(method, self._link_api + path, **kwargs)
+
+    async def login_async(self, email:str, password:str, concurrency:int=4):
+        """
+        Faz o login na API do painel sem bloquear o event loop e retorna uma sessão
+        `aiohttp.ClientSession` autenticada, com até `concurrency` conexões simultâneas
+
+        A sessão deve ser fechada com `await session.close()`. Como o backend "http", só
+        roda contra o painel local: a API do painel (`_api_map`) não foi verificada no
+        painel real e lá levanta ValueError, antes de enviar a senha.
+        """
+        import aiohttp
+
+        self._check_api()
+
+        session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=max(1, concurrency)),
+                                        timeout=aiohttp.ClientTimeout(total=30))
+        try:
+            async with self._async_request(session, "login",
+                                           json={"email": email, "password": password}) as response:
+                if response.status in [401, 403]:
+                    raise ValueError("Usuário ou senha inválidos")
+                response.raise_for_status()
+                token = (await response.json(content_type=None))["token"]
+        except BaseException:
+            await session.close()
+            raise
+        session.headers["Authorization"] = "Bearer " + token
+        return session
+
+    async def _async_place(self, session, address:str, cached:bool=True) -> dict:
+        """Versão assíncrona do `_http_place`"""
+        place = _cached_place(address) if cached else None
+        if place and "place_id" in place:
+            return place
+        async with self._async_request(session, "address", params={"input": address}) as response:
+            if response.status == 401:
+                raise SessionLost("Sessão expirada")
+            response.raise_for_status()
+            places = await response.json(content_type=None)
+        if not places:
+            raise ValueError("Endereço não encontrado: '%s'" % address)
+        _store_place(address, places[0])
+        return places[0]
+
+    async def setup_ride_async(self, session, ride:Ride):
+        """
+        Envia uma viagem pela sessão do `login_async`, com os mesmos erros do backend "http"
+
+        Parameters:
+        -----------
+        session : aiohttp.ClientSession
+            Sessão retornada pelo `login_async`.
+        ride : Ride
+            Viagem da agenda, como as de `rides`.
+        """
+        import asyncio
+
+        _from, _to = getattr(self, ride.origin), getattr(self, ride.destination)
+        for cached in [True, False]:
+            origin, destination = await asyncio.gather(self._async_place(session, _from, cached),
+                                                       self._async_place(session, _to, cached))
+            async with self._async_request(session, "ride", json={
+                "date": ride.label,
+                "time": ride.time,
+                "origin": origin,
+                "destination": destination,
+                "justification": "Turno"
+            }) as response:
+                status = response.status
+            # Endereço recusado: a sugestão guardada não vale mais, busca de novo
+            if status != 400:
+                break
+            _store_place(_from)
+            _store_place(_to)
+        if status == 401:
+            raise SessionLost("Sessão expirada")
+        if status == 409:
+            raise AlreadyBooked("Corrida já agendada")
+        if status == 422:
+            raise TooLate("Tempo anterior")
+        response.raise_for_status()
+
+    async def _async_scheduled_rides(self, session) -> set:
+        """Versão assíncrona do `_http_scheduled_rides`"""
+        async with self._async_request(session, "rides") as response:
+            response.raise_for_status()
+            rides = await response.json(content_type=None)
+        return {(_parse_date(ride["date"]),
+                 ride["time"][:5],
+                 _normalize_address(ride["origin"]["description"]),
+                 _normalize_address(ride["destination"]["description"]))
+                for ride in rides}
+
+    async def setup_rides_async(self, email:str, password:str, concurrency:int=4,
+                                reconcile:bool=False, semaphore=None):
+        """
+        Agenda a escala pela API do painel dentro de um event loop, sem uma thread por
+        viagem, entregando cada resultado assim que a viagem termina
+
+        Como o backend "http", só roda contra o painel local (veja `login_async`).
+
+        Parameters:
+        -----------
+        email : str
+            E-mail Petrobras.
+        password : str
+            Senha do Mobicity.
+        concurrency : int, default 4
+            Número máximo de viagens enviadas ao mesmo tempo.
+        reconcile : bool, default False
+            Lê as corridas já agendadas no painel e envia somente as que faltam. Se a
+            leitura falhar, avisa e envia todas as viagens.
+        semaphore : asyncio.Semaphore, default None
+            Limite compartilhado entre várias escalas no mesmo event loop, no lugar de
+            `concurrency`.
+
+        Yields:
+        -------
+        tuple
+            `(dia, sentido, erro)` de cada viagem na ordem em que terminam, sendo `erro`
+            igual a `None` para as viagens agendadas (ou já agendadas) com sucesso. Se o
+            novo login depois de uma sessão caída falhar, a viagem e as que ainda não
+            foram enviadas terminam com o erro desse login.
+
+        Example:
+        --------
+        ```python
+        async for day, way, error in m.setup_rides_async(email, password, concurrency=8):
+            print(day, way, error or "Ok.")
+        ```
+        """
+        import asyncio
+
+        self._checkup()
+        semaphore = semaphore or asyncio.Semaphore(max(1, concurrency))
+        async with semaphore:
+            sessions = [await self.login_async(email, password, concurrency)]
+        relogin = asyncio.Lock()
+        # Falha do novo login, repassada às viagens seguintes no lugar da sessão caída
+        lost = []
+
+        async def submit(ride):
+            async with semaphore:
+                for attempt in range(self.retries + 1):
+                    if lost:
+                        return ride, lost[-1]
+                    session = sessions[-1]
+                    try:
+                        await self.setup_ride_async(session, ride)
+                        return ride, None
+                    except Exception as e:
+                        error = _ride_error(e)
+                        if not getattr(error, "retry", None) or attempt == self.retries:
+                            return ride, error
+                        if error.retry == "login":
+                            async with relogin:
+                                # Só a primeira viagem que perceber a queda refaz o login
+                                if sessions[-1] is session and not lost:
+                                    try:
+                                        sessions.append(await self.login_async(email, password, concurrency))
+                                    except Exception as e:
+                                        lost.append(_ride_error(e))
+                            if lost:
+                                return ride, lost[-1]
+                        await asyncio.sleep(_RETRY_BACKOFF * 2 ** attempt)
+
+        tasks = []
+        try:
+            pending = self.rides
+            scheduled = None
+            if reconcile:
+                try:
+                    async with semaphore:
+                        scheduled = await self._async_scheduled_rides(sessions[0])
+                except Exception as e:
+                    import warnings
+                    warnings.warn("Falha na leitura das corridas agendadas no painel (%s), "
+                                  "enviando todas as viagens" % _ride_error(e), stacklevel=2)
+            if scheduled is not None:
+                for ride in pending:
+                    if self._is_scheduled(ride, scheduled):
+                        yield ride.day, ride.way, None
+                pending = [ride for ride in pending if not self._is_scheduled(ride, scheduled)]
+
+            tasks = [asyncio.ensure_future(submit(ride)) for ride in pending]
+            for future in asyncio.as_completed(tasks):
+                ride, error = await future
+                yield ride.day, ride.way, error
+        finally:
+            # Interrompido no meio (break, cancelamento): as viagens em curso são canceladas
+            for task in tasks:
+                task.cancel()
+            for session in sessions:
+                await session.close()
+
+def setup_fleet(fleet:list, workers:int=4, **kwargs) -> list:
+    """
+    Agenda as escalas de vários usuários num pool compartilhado e limitado de sessões
+
+    Cada escala ocupa uma sessão do pool (navegador ou HTTP) do login até a última
+    corrida, de forma que o tempo total acompanha o tamanho do pool e não o número de
+    usuários.
+
+    Parameters:
+    -----------
+    fleet : list
+        Lista de tuplas `(nome, mobicity, email, senha)`.
+    workers : int, default 4
+        Número máximo de sessões abertas ao mesmo tempo.
+    **kwargs
+        Repassados ao `setup_rides` de cada escala (backend, reconcile, ...).
+
+    Returns:
+    --------
+    list
+        Lista de tuplas `(nome, resultado)` na ordem de `fleet`, sendo o resultado a lista
+        retornada pelo `setup_rides` ou a exceção que interrompeu a escala (configuração
+        incompleta, etc.). Um login que falhou não interrompe a escala: vem na lista, como
+        o mesmo erro em todas as viagens que ficaram sem envio.
+    """
+    def job(m, email, password):
         try:
-            elem = WebDriverWait(browser, 10).until(lambda x: x.find_element(*Mobicity._site_map["atention_before_time"]))
-            before_time = True
+            return m.setup_rides(email, password, workers=1, **kwargs)
         except Exception as e:
-            pass
-        if before_time:
-            if elem.text == "Atenção!":
-                raise ValueError("Tempo anterior")
-
-        # Justifica Turno
-        elem = WebDriverWait(browser, 30).until(lambda x: x.find_element(*Mobicity._site_map["justify"]))
-        elem.send_keys("Turno")
-        sleep(5)
-        elem.send_keys(Keys.ENTER)
-        sleep(5)
-        browser.execute_script(
-            "arguments[0].click();",
-            browser.find_element(*Mobicity._site_map["forward_justify"])
-        )
-        sleep(5)
-        
-        # Já há corrida agendada?
-        agendada = False
+            return e
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [pool.submit(job, m, email, password) for _, m, email, password in fleet]
+        return [(name, future.result()) for (name, *_), future in zip(fleet, futures)]
+
+async def setup_fleet_async(fleet:list, concurrency:int=4, **kwargs) -> list:
+    """
+    Versão assíncrona do `setup_fleet`: agenda as escalas de vários usuários num único
+    event loop, com no máximo `concurrency` requisições ao painel ao mesmo tempo
+
+    Parameters:
+    -----------
+    fleet : list
+        Lista de tuplas `(nome, mobicity, email, senha)`.
+    concurrency : int, default 4
+        Limite de viagens (e logins) em andamento, somando todas as escalas.
+    **kwargs
+        Repassados ao `setup_rides_async` de cada escala (reconcile).
+
+    Returns:
+    --------
+    list
+        Lista de tuplas `(nome, resultado)` na ordem de `fleet`, sendo o resultado a lista
+        de `(dia, sentido, erro)` na ordem em que terminaram ou a exceção que interrompeu
+        a escala.
+    """
+    import asyncio
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def job(m, email, password):
         try:
-            elem = WebDriverWait(browser, 5).until(lambda x: x.find_element(*Mobicity._site_map["atention"]))
-            agendada = True
+            return [result async for result in m.setup_rides_async(email, password,
+                                                                   concurrency=concurrency,
+                                                                   semaphore=semaphore,
+                                                                   **kwargs)]
         except Exception as e:
-            # Tudo ok, seguindo
-            pass
-        if agendada:
-            if elem.text == "Atenção!":
-                raise ValueError("Corrida já agendada")
+            return e
 
-        # Achou motorista
-        elem = WebDriverWait(browser, 30).until(lambda x: x.find_element(*Mobicity._site_map["forward_conclude"]))
-        # O botão fica obscurecido algumas vezes
-        elem.click()
-        
-        # Aguardada a mensagem de agendada
-        WebDriverWait(browser, 30).until(lambda x: x.find_element(*Mobicity._site_map["finish"]))
-    
-    def _browser_kill(self):
-        self._browser.quit()
-        delattr(self, "_browser")
+    results = await asyncio.gather(*(job(m, email, password) for _, m, email, password in fleet))
+    return [(name, result) for (name, *_), result in zip(fleet, results)]
+
+def _sleep_until(when:datetime, stop:Event) -> bool:
+    """
+    Dorme até o horário local `when`, retornando False se `stop` for sinalizado antes
+
+    Acorda a cada minuto para conferir o relógio, que pode ter sido ajustado ou ficado
+    parado com o computador suspenso.
+    """
+    while not stop.is_set():
+        left = (when - datetime.now()).total_seconds()
+        if left <= 0:
+            return True
+        stop.wait(min(left, 60))
+    return False
+
+def run_daemon(fleet:list, window:int=7, opening:str="00:00", warmup:float=120, workers:int=2,
+               backend:str="browser", stop:Event=None, log=print):
+    """
+    Agenda as escalas de `fleet` sem intervenção, à medida que o painel libera cada dia
+
+    O painel aceita corridas até `window` dias à frente, liberando um novo dia todos os
+    dias às `opening` horas. Ao iniciar, agenda o que já está liberado. Depois, `warmup`
+    segundos antes de cada abertura, abre e loga uma sessão por viagem dos usuários que
+    têm viagens no dia que vai ser liberado (até `workers` por usuário), e envia todas
+    assim que o dia é liberado.
+
+    Parameters:
+    -----------
+    fleet : list
+        Lista de tuplas `(nome, mobicity, email, senha)`. O `start_day` de cada escala é o
+        início do ciclo do revezamento; o horizonte (`days`) é estendido conforme os dias
+        vão sendo liberados.
+    window : int, default 7
+        Quantos dias à frente o painel aceita agendamentos.
+    opening : str, default "00:00"
+        Horário "HH:MM" em que o painel libera um novo dia.
+    warmup : float, default 120
+        Antecedência, em segundos, com que as sessões são abertas antes da abertura.
+    workers : int, default 2
+        Máximo de sessões em paralelo por usuário.
+    backend : str, default "browser"
+        Backend do `setup_rides`.
+    stop : threading.Event, default None
+        Encerra o serviço quando sinalizado.
+    log : callable, default print
+        Recebe as mensagens de andamento.
+    """
+    if not _valid_time(opening):
+        raise ValueError(f"Horário de abertura '{opening}' fora do formato HH:MM")
+    stop = stop or Event()
+    opening = datetime.strptime(opening, "%H:%M").time()
+
+    def due(m, days:set) -> list:
+        last = max(days)
+        if last >= m.start_day + timedelta(days=m.days):
+            m.days = (last - m.start_day).days + 1
+        return [ride for ride in m.rides if ride.date in days]
+
+    def submit(fleet:list, days:set, warm:dict, reconcile:bool):
+        def job(name, m, email, password):
+            try:
+                results = m.setup_rides(email, password, workers=min(workers, len(due(m, days))),
+                                        reconcile=reconcile,
+                                        backend=backend, dates=days, warm=warm.get(name))
+            except Exception as e:
+                return log(f"{name}: falhou ({e})")
+            errors = [(day, way, error) for day, way, error in results if error is not None]
+            log(f"{name}: {len(results) - len(errors)}/{len(results)} corridas agendadas")
+            for day, way, error in errors:
+                log(f"    {day} {way}: {error}")
+
+        with ThreadPoolExecutor(max_workers=max(1, len(fleet))) as pool:
+            for future in [pool.submit(job, *user) for user in fleet]:
+                future.result()
+
+    # Tudo o que já está liberado, conferindo o que já foi agendado
+    now = datetime.now()
+    opened = now.date() if now.time() >= opening else now.date() - timedelta(days=1)
+    days = {now.date() + timedelta(days=i) for i in range((opened - now.date()).days + window + 1)}
+    pending = [user for user in fleet if due(user[1], days)]
+    if pending:
+        log(f"Agendando os dias já liberados, até {max(days).strftime('%d/%m/%Y')}")
+        submit(pending, days, {}, reconcile=True)
+
+    while not stop.is_set():
+        now = datetime.now()
+        at = datetime.combine(now.date(), opening)
+        if at <= now:
+            at += timedelta(days=1)
+        days = {at.date() + timedelta(days=window)}
+        pending = [user for user in fleet if due(user[1], days)]
+        if not pending:
+            log(f"Nenhuma viagem em {max(days).strftime('%d/%m/%Y')}, aguardando a próxima abertura")
+            # Passa da abertura antes de procurar a próxima
+            if not _sleep_until(at + timedelta(seconds=1), stop):
+                break
+            continue
+
+        log(f"Próxima abertura: {at.strftime('%d/%m/%Y %H:%M')} libera {max(days).strftime('%d/%m/%Y')}"
+            f" ({len(pending)} usuário(s))")
+        if not _sleep_until(at - timedelta(seconds=warmup), stop):
+            break
+        warm = dict()
+        for name, m, email, password in pending:
+            try:
+                warm[name] = m.warm_up(email, password, workers=min(workers, len(due(m, days))),
+                                       backend=backend)
+            except Exception as e:
+                # Sem sessão aquecida o setup_rides faz o login na hora
+                log(f"{name}: falha ao abrir a sessão com antecedência ({e})")
+        try:
+            if not _sleep_until(at, stop):
+                break
+            log(f"Abertura de {at.strftime('%d/%m/%Y %H:%M')}, enviando")
+            # A partir daqui as sessões são do setup_rides, que as fecha ao final
+            warm, handed = dict(), warm
+            submit(pending, days, handed, reconcile=False)
+        finally:
+            # Sessões abertas que não chegaram a ser usadas (serviço encerrado antes da abertura)
+            for name, m, *_ in pending:
+                for session in warm.get(name, []):
+                    m._backend(backend)[3](session)
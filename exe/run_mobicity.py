@@ -1,9 +1,10 @@
+from concurrent.futures import ThreadPoolExecutor
 from getpass import getpass
-from mobicity import Mobicity
-from os import listdir
-from os.path import join, split
+from mobicity import Mobicity, prelaunch, run_daemon, setup_fleet
+from os import environ, listdir
+from os.path import isdir, join, split
 
-from datetime import datetime, timedelta
+from datetime import datetime
 import json
 import sys
 
@@ -11,9 +12,20 @@ _hoje = datetime.today().strftime("%d/%m/%Y")
 _help = f"""Seguem parâmetros, inclusive o que é visto será considerado como padrão, caso não informado.
 --usuario=[raiz do e-mail] : Parte anterior ao @petrobras.com.br
 --json=parameters.json : Definição de arquivo onde buscar parâmetros
---turno=dia : [dia/noite]
+--turno=dia : [dia/noite] ou uma escala de revezamento como 3D+3N, 7D+7F ou 14x14
 --inicio={_hoje} : Definição de data de início do turno
---dias=6 : Definição de dias do turno
+--dias=6 : Definição de dias do turno (um ciclo completo nas escalas de revezamento)
+--navegadores=1 : Número de navegadores agendando em paralelo
+--leve=nao : [sim/nao] Navegador sem janela, GPU e extensões, consumindo menos memória (no Edge, só o carregamento antecipado da página)
+--driver=[caminho] : WebDriver local fixo, para rodar sem internet (ou variável MOBICITY_DRIVER)
+--sessao=nao : [sim/nao] Guarda a sessão (criptografada) para pular o login nas próximas execuções
+--trace=[arquivo] : Grava a duração de cada etapa e imprime o resumo por etapa ao final
+--diario=sim : [sim/nao/arquivo] Registra cada corrida num diário SQLite; uma nova execução envia só as que faltam
+--frota=[pasta ou manifesto] : Agenda vários usuários num pool de --navegadores sessões (4 por padrão)
+--servico=nao : [sim/nao] Fica rodando e agenda cada dia assim que o painel o libera (com --frota ou --json)
+--janela=7 : Dias à frente que o painel aceita agendamentos (modo serviço)
+--abertura=00:00 : Horário em que o painel libera um novo dia (modo serviço)
+--aquecimento=120 : Segundos de antecedência para abrir e logar as sessões antes da abertura (modo serviço)
 """
 
 def busca_json(filename=None):
@@ -39,86 +51,198 @@ def le_json(jsonpath: str):
         data = json.loads(txt)
     return data
 
-def setup(m, usr, pwd, k=2):
+def setup(m, usr, pwd, k=2, workers=1, trace="", warm=None, journal=False):
+    # Cada passada lê o painel e envia apenas as corridas que faltam. As falhas passageiras
+    # já são tentadas de novo dentro da passada; uma nova passada só acontece se restou
+    # alguma que ainda pode dar certo (as definitivas, como "Tempo anterior", não).
+    # As sessões já logadas (warm) são usadas na primeira passada
     for i in range(k):
         print("Executando!")
-        m.setup_rides(usr, pwd, verbose=True)
+        results = m.setup_rides(usr, pwd, verbose=True, workers=workers, reconcile=True,
+                                trace=trace, warm=warm if i == 0 else None,
+                                journal=journal)
+        if not any(getattr(error, "retry", None) for day, way, error in results):
+            break
 
-def configura_mobicity(data: dict):
+def sim(valor: str) -> bool:
+    return valor.lower() in ["sim", "s"]
+
+def diario(argv: dict):
+    # Diário na pasta de cache por padrão, desligado com "nao" ou num arquivo informado
+    valor = argv.get("diario", "sim")
+    return valor if valor.lower() not in ["sim", "s", "nao", "n"] else sim(valor)
+
+def configura_navegador(m, argv: dict):
+    m.browser_name = "edge"
+    m.lean = sim(argv.get("leve", "nao"))
+    m.keep_session = sim(argv.get("sessao", "nao"))
+    if argv.get("driver"):
+        m.driver_path = argv["driver"]
+
+def abre_navegador(argv: dict):
+    # Abre o navegador (o mesmo do configura_navegador) na página de login enquanto as
+    # perguntas são respondidas; o login do setup usa esse navegador
+    prelaunch("edge", sim(argv.get("leve", "nao")), argv.get("driver") or environ.get("MOBICITY_DRIVER", ""))
+
+def cria_mobicity(data: dict, shift: str, start_day: str, days: int, argv: dict) -> Mobicity:
+    # Turno único ("day"/"night") ou escala de revezamento ("3d+3n", "14x14", ...),
+    # sempre num único Mobicity, com um login e uma fila de corridas
+    rotation = "" if shift in ["day", "night"] else shift
+    m = Mobicity(
+        shift="" if rotation else shift,
+        time_to_work=data["time"]["time_to_work"],
+        time_to_home=data["time"]["time_to_home"],
+        start_day=start_day,
+        rotation=rotation,
+        **data['addresses']
+    )
+    m.days = days if days else len(m.cycle) if rotation else 6
+
+    configura_navegador(m, argv)
+    for turno in ["day", "night"]:
+        for schedule in data["week_schedule"].get(turno, []):
+            m.setup_schedule_weekdays(shift=turno, **schedule)
+    return m
+
+def configura_mobicity(data: dict, argv: dict):
     year = datetime.today().year
 
-    addresses = data['addresses']
-    shift = ["day", "night", "3d+3n"][int(input('Dia [1] / Noite [2] / 3D+3N [3]: ')) - 1]
+    opcao = input('Dia [1] / Noite [2] / 3D+3N [3] / Outra escala [4]: ')
+    shift = {"1": "day", "2": "night", "3": "3d+3n"}.get(opcao) or input("Escala (ex.: 7D+7F, 14x14): ")
     start_day = input("Data de início [DD/MM/AAAA ou DD/MM/*ano atual*]: ")
 
     start_day = start_day if len(start_day.split(r"/")) == 3 else start_day + r"/" + str(year)
 
-    m = False
-    m1 = False
-    m2 = False
-    if shift in ["day", "night"]:
-        time_to_work = data["time"]["time_to_work"][shift]
-        time_to_home = data["time"]["time_to_home"][shift]
-        d = input("Quantos dias da escala? [1 a 6], 6 é a resposta padrão ")
-        d = int(d) if d in map(str, range(1,7)) else 6
-
-        m = Mobicity(
-            shift=shift,
-            time_to_work=time_to_work,
-            time_to_home=time_to_home,
-            start_day=start_day,
-            days=d,
-            **addresses
+    d = input("Quantos dias da escala? Enter considera 6 dias ou um ciclo completo da escala ")
+    d = int(d) if d.isdigit() and int(d) > 0 else 0
+
+    m = cria_mobicity(data, shift, start_day, d, argv)
+
+    pwd = getpass("Senha do Mobicity (não é a senha Petrobras): ")
+    usr = data['username'] + "@petrobras.com.br"
+
+    # O login começa assim que a senha é digitada, enquanto os parâmetros são conferidos
+    # (com --trace fica dentro do setup, para ser medido)
+    login = None
+    if not argv.get("trace"):
+        pool = ThreadPoolExecutor(max_workers=1)
+        login = pool.submit(m.warm_up, usr, pwd, 1)
+        pool.shutdown(wait=False)
+    print(m)
+
+    if input("Confirma parâmetros? ([S]/N) ") in ["Sim", "S", "s", "", " "]:
+        try:
+            warm = login.result() if login else None
+        except Exception as e:
+            # O setup tenta o login de novo e relata o erro, se persistir
+            print(f"Falha no login antecipado ({e}), tentando de novo.")
+            warm = None
+        setup(
+            m,
+            usr,
+            pwd,
+            workers=int(argv.get("navegadores", 1)),
+            trace=argv.get("trace", ""),
+            warm=warm,
+            journal=diario(argv)
         )
+    elif login:
+        try:
+            for browser in login.result():
+                browser.quit()
+        except Exception:
+            pass
+
+def carrega_frota(path: str, argv: dict) -> list:
+    """
+    Lê a frota de usuários de um diretório com um json de parâmetros por usuário ou de um
+    manifesto json no formato:
+        {"usuarios": [{"json": "fulano.json", "turno": "dia", "inicio": "20/02/2025", "dias": 6}]}
+    Turno, início e dias não informados vêm de --turno, --inicio e --dias. A senha vem da
+    chave "senha", da variável de ambiente MOBICITY_SENHA_<USUARIO> ou é perguntada.
+    """
+    if isdir(path):
+        entries = [{"json": join(path, f)} for f in sorted(listdir(path)) if f.endswith(".json")]
     else:
-        #Armengue para escala 3D+3N
-        # parte 1: Dia
-        time_to_work = data["time"]["time_to_work"]["day"]
-        time_to_home = data["time"]["time_to_home"]["day"]
-        m1 = Mobicity(
-            shift="day",
-            time_to_work=time_to_work,
-            time_to_home=time_to_home,
-            start_day=start_day,
-            days=3,
-            **addresses
-        )
-        
-        # parte 2: Noite
-        start_day = (datetime.fromisoformat("-".join(start_day.split(r"/")[::-1])) + timedelta(days=3)).strftime(r"%d/%m/%Y")
-        time_to_work = data["time"]["time_to_work"]["night"]
-        time_to_home = data["time"]["time_to_home"]["night"]
-        m2 = Mobicity(
-            shift="night",
-            time_to_work=time_to_work,
-            time_to_home=time_to_home,
-            start_day=start_day,
-            days=3,
-            **addresses
-        )
+        base = split(path)[0]
+        entries = [dict(e, json=join(base, e["json"])) for e in le_json(path)["usuarios"]]
 
-    pwd = getpass("Senha do Mobicity (não é a senha Petrobras): ")
-    for mx in [m, m1, m2]:
-        if mx:
-            mx.browser_name = "edge"
-            for schedule in data['week_schedule'][mx.shift]:
-                mx.setup_schedule_weekdays(**schedule)
-            print(mx)
-
-            if input("Confirma parâmetros? ([S]/N) ") in ["Sim", "S", "s", "", " "]:
-                setup(
-                    mx,
-                    data['username'] + "@petrobras.com.br",
-                    pwd
-                )
+    shifts = {"dia": "day", "noite": "night"}
+    fleet = []
+    for entry in entries:
+        data = le_json(entry["json"])
+        user = data["username"]
+        shift = entry.get("turno", argv.get("turno", "dia")).lower()
+        shift = shifts.get(shift, shift)
+        start_day = entry.get("inicio", argv.get("inicio", _hoje))
+        days = int(entry.get("dias", argv.get("dias", 0)))
+        pwd = (entry.get("senha")
+               or environ.get("MOBICITY_SENHA_" + user.upper())
+               or getpass(f"Senha do Mobicity de {user}: "))
+        fleet.append((user, cria_mobicity(data, shift, start_day, days, argv),
+                      user + "@petrobras.com.br", pwd))
+    return fleet
+
+def roda_frota(argv: dict):
+    fleet = carrega_frota(argv["frota"], argv)
+    print(f"Agendando {len(fleet)} escalas com {argv.get('navegadores', 4)} sessões em paralelo.")
+    report = setup_fleet(fleet,
+                         workers=int(argv.get("navegadores", 4)),
+                         reconcile=True,
+                         journal=diario(argv))
+    for user, results in report:
+        if isinstance(results, Exception):
+            print(f"{user}: falhou ({results})")
+            continue
+        errors = [(day, way, error) for day, way, error in results if error is not None]
+        # Um login que falhou vem como o mesmo erro em todas as corridas
+        if results and len(errors) == len(results) and all(error is errors[0][2] for *_, error in errors):
+            print(f"{user}: falhou ({errors[0][2]})")
+            continue
+        print(f"{user}: {len(results) - len(errors)}/{len(results)} corridas agendadas")
+        for day, way, error in errors:
+            print(f"    {day} {way}: {error}")
+
+def roda_servico(argv: dict):
+    # O início (--inicio) é o começo do ciclo da escala, e o horizonte cresce a cada abertura
+    if "frota" in argv:
+        fleet = carrega_frota(argv["frota"], argv)
+    else:
+        data = le_json(argv.get("json") or busca_json())
+        user = data["username"]
+        shift = argv.get("turno", "dia").lower()
+        shift = {"dia": "day", "noite": "night"}.get(shift, shift)
+        pwd = environ.get("MOBICITY_SENHA_" + user.upper()) or getpass("Senha do Mobicity (não é a senha Petrobras): ")
+        fleet = [(user, cria_mobicity(data, shift, argv.get("inicio", _hoje), 1, argv),
+                  user + "@petrobras.com.br", pwd)]
+
+    def log(msg):
+        print(datetime.now().strftime("%d/%m %H:%M:%S"), msg, flush=True)
+
+    log(f"Serviço iniciado para {len(fleet)} usuário(s), Ctrl+C encerra.")
+    try:
+        run_daemon(fleet,
+                   window=int(argv.get("janela", 7)),
+                   opening=argv.get("abertura", "00:00"),
+                   warmup=float(argv.get("aquecimento", 120)),
+                   workers=int(argv.get("navegadores", 2)),
+                   log=log)
+    except KeyboardInterrupt:
+        log("Serviço encerrado.")
 
 if "--help" in sys.argv:
     print(_help)
 else:
     argv = {x[0].replace("--", ""): x[1] for x in [i.split("=") for i in sys.argv[1:] if "=" in i]}
-    if "json" not in argv:
-        argv["json"] = busca_json()
-    
-    data = le_json(argv["json"])
+    if sim(argv.get("servico", "nao")):
+        roda_servico(argv)
+    elif "frota" in argv:
+        roda_frota(argv)
+    else:
+        abre_navegador(argv)
+        if "json" not in argv:
+            argv["json"] = busca_json()
+        
+        data = le_json(argv["json"])
 
-    configura_mobicity(data)
+        configura_mobicity(data, argv)
\ No newline at end of file
@@ -0,0 +1,224 @@
+"""
+Medição de desempenho do agendamento contra o painel local (`mock_dashboard`)
+
+Roda o `Mobicity.setup_rides` completo, com o backend e o número de sessões
+escolhidos, e informa corridas por minuto, latência por corrida (p50/p95), tempo de
+login e memória por sessão. Os caches do `mobicity` (tempos de espera, endereços,
+localizadores, sessões) ficam numa pasta temporária durante a medição, para que as
+medidas e os dados falsos do painel local não passem para o `~/.mobicity`.
+
+Com `--partida` mede a partida a frio do `run_mobicity.py --help` e da montagem de um
+`Mobicity`, falhando se passar de `--limite` segundos ou se carregar alguma biblioteca
+pesada (pandas, selenium, ...).
+
+Uso:
+----
+```text
+python benchmark.py --backend=http --sessoes=4 --dias=6 --latencia=0.05
+python benchmark.py --backend=browser --browser=chrome --leve=sim --sessoes=2
+python benchmark.py --partida=sim --limite=0.5
+```
+"""
+from contextlib import contextmanager
+from datetime import date, timedelta
+from time import perf_counter
+import os
+import subprocess
+import sys
+import tempfile
+
+from mobicity import Mobicity, _percentile
+import mobicity
+from mock_dashboard import MockDashboard
+
+def _rss(pid:int) -> int:
+    """Memória residente do processo `pid` em bytes, 0 fora do Linux"""
+    try:
+        with open("/proc/%i/statm" % pid) as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+def _tree_rss(pid:int) -> int:
+    """Memória residente do processo `pid` somada à de todos os seus descendentes"""
+    children = dict()
+    for entry in os.listdir("/proc") if os.path.isdir("/proc") else []:
+        if entry.isdigit():
+            try:
+                with open("/proc/%s/stat" % entry) as f:
+                    ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+                children.setdefault(ppid, []).append(int(entry))
+            except (OSError, ValueError, IndexError):
+                continue
+    total, stack = 0, [pid]
+    while stack:
+        p = stack.pop()
+        total += _rss(p)
+        stack += children.get(p, [])
+    return total
+
+# Estado do `mobicity` ligado à pasta de cache, lido de novo na primeira consulta
+_CACHE_STATE = ("_CACHE_DIR", "_waits", "_waits_changed", "_places", "_locators")
+
+@contextmanager
+def _scratch_cache():
+    """Aponta os caches do `mobicity` para uma pasta temporária, restaurando-os ao final"""
+    saved = {name: getattr(mobicity, name) for name in _CACHE_STATE}
+    with tempfile.TemporaryDirectory(prefix="mobicity-benchmark-") as path:
+        mobicity._CACHE_DIR = path
+        mobicity._waits = mobicity._places = mobicity._locators = None
+        mobicity._waits_changed = False
+        try:
+            yield path
+        finally:
+            for name, value in saved.items():
+                setattr(mobicity, name, value)
+
+def run_benchmark(backend:str="http", sessions:int=1, days:int=6, latency:float=0.05,
+                  browser_name:str="chrome", lean:bool=True) -> dict:
+    """
+    Agenda `days` dias (2 corridas por dia) no painel local e retorna as medições
+
+    Parameters:
+    -----------
+    backend : str, default "http"
+        Backend do `setup_rides`, "http" ou "browser".
+    sessions : int, default 1
+        Número de sessões em paralelo (`workers` do `setup_rides`).
+    days : int, default 6
+        Dias da escala.
+    latency : float, default 0.05
+        Atraso, em segundos, de cada resposta do painel local.
+    browser_name : str, default "chrome"
+        Navegador usado no backend "browser".
+    lean : bool, default True
+        Modo enxuto do navegador.
+    """
+    m = Mobicity(shift="day",
+                 time_to_work="05:55",
+                 time_to_home="19:05",
+                 start_day=(date.today() + timedelta(days=7)).strftime(r"%d/%m/%Y"),
+                 days=days,
+                 home="R. de Casa, 10 - Centro, Rio de Janeiro - RJ")
+    m.browser_name = browser_name
+    m.lean = lean
+
+    logins, rides, memory = [], [], []
+    login = getattr(m, "_%s_login" % backend)
+    setup_ride = getattr(m, "_%s_setup_ride" % backend)
+
+    def timed_login(email, password):
+        rss = _rss(os.getpid())
+        start = perf_counter()
+        session = login(email, password)
+        logins.append(perf_counter() - start)
+        if backend == "browser":
+            memory.append(_tree_rss(session.service.process.pid))
+        else:
+            memory.append(max(0, _rss(os.getpid()) - rss))
+        return session
+
+    def timed_setup_ride(*args):
+        start = perf_counter()
+        try:
+            setup_ride(*args)
+        finally:
+            rides.append(perf_counter() - start)
+
+    # O setup_rides busca os passos do backend na instância
+    setattr(m, "_%s_login" % backend, timed_login)
+    setattr(m, "_%s_setup_ride" % backend, timed_setup_ride)
+
+    with _scratch_cache(), MockDashboard(latency=latency) as server:
+        server.point(m)
+        start = perf_counter()
+        results = m.setup_rides(server.email, server.password, workers=sessions, backend=backend)
+        wall = perf_counter() - start
+
+    return {
+        "backend": backend,
+        "sessions": sessions,
+        "rides": len(rides),
+        "errors": sum(1 for *_, error in results if error is not None),
+        "wall": wall,
+        "rides_per_minute": 60 * len(rides) / wall if wall else float("nan"),
+        "ride_p50": _percentile(rides, 50),
+        "ride_p95": _percentile(rides, 95),
+        "login_p50": _percentile(logins, 50),
+        "memory_per_session": sum(memory) / len(memory) if memory else 0,
+    }
+
+# Bibliotecas que o planejamento da escala não pode carregar
+_HEAVY_MODULES = ("pandas", "numpy", "selenium", "webdriver_manager", "requests", "cryptography")
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Comandos da partida a frio, rodados com o interpretador atual a partir desta pasta
+_COLD_STARTS = {
+    "run_mobicity --help": [os.path.join(_HERE, "..", "exe", "run_mobicity.py"), "--help"],
+    "Mobicity(...)": ["-c", "from mobicity import Mobicity; repr(Mobicity(shift='day', "
+                            "time_to_work='05:55', time_to_home='19:05', start_day='03/02/2025', "
+                            "rotation='3D+3N', home='R. de Casa, 10'))"],
+}
+
+def cold_start(args:list, repeat:int=5) -> dict:
+    """
+    Roda `python -X importtime args` `repeat` vezes e retorna a mediana do tempo total,
+    a mediana do tempo gasto em imports e as bibliotecas pesadas carregadas
+    """
+    walls, imports, heavy = [], [], set()
+    for _ in range(repeat):
+        start = perf_counter()
+        proc = subprocess.run([sys.executable, "-X", "importtime"] + args, cwd=_HERE,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        walls.append(perf_counter() - start)
+        if proc.returncode:
+            raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+        total = 0
+        # Linhas no formato "import time: self [us] | cumulative | módulo"
+        for line in proc.stderr.splitlines():
+            fields = line.split("|")
+            if line.startswith("import time:") and fields[0].split(":")[1].strip().isdigit():
+                total += int(fields[0].split(":")[1])
+                module = fields[2].strip().split(".")[0]
+                if module in _HEAVY_MODULES:
+                    heavy.add(module)
+        imports.append(total / 1e6)
+    return {"wall": _percentile(walls, 50), "imports": _percentile(imports, 50), "heavy": sorted(heavy)}
+
+def check_cold_start(limit:float=0.5, repeat:int=5) -> bool:
+    """Imprime a partida a frio de cada comando e retorna se todos ficaram dentro do limite"""
+    ok = True
+    for name, args in _COLD_STARTS.items():
+        result = cold_start(args, repeat)
+        passed = result["wall"] <= limit and not result["heavy"]
+        ok = ok and passed
+        print("%-22s %.3f s (imports %.3f s)%s %s" % (name,
+                                                    result["wall"],
+                                                    result["imports"],
+                                                    ", carregou " + ", ".join(result["heavy"]) if result["heavy"] else "",
+                                                    "ok" if passed else "FALHOU"))
+    return ok
+
+def report(result:dict) -> str:
+    memory = result["memory_per_session"]
+    return "\n".join([
+        "Backend: %(backend)s, sessões: %(sessions)i" % result,
+        "Corridas: %(rides)i (%(errors)i com erro) em %(wall).2f s" % result,
+        "Corridas por minuto: %(rides_per_minute).1f" % result,
+        "Latência por corrida: p50 %.3f s, p95 %.3f s" % (result["ride_p50"], result["ride_p95"]),
+        "Login (abrir sessão até o painel): p50 %.3f s" % result["login_p50"],
+        "Memória por sessão: %s" % ("%.1f MB" % (memory / 2**20) if memory else "n/d"),
+    ])
+
+
+if __name__ == "__main__":
+    argv = {x[0].replace("--", ""): x[1] for x in [i.split("=") for i in sys.argv[1:] if "=" in i]}
+    if argv.get("partida", "nao").lower() in ["sim", "s"]:
+        sys.exit(0 if check_cold_start(float(argv.get("limite", 0.5))) else 1)
+    print(report(run_benchmark(backend=argv.get("backend", "http"),
+                               sessions=int(argv.get("sessoes", 1)),
+                               days=int(argv.get("dias", 6)),
+                               latency=float(argv.get("latencia", 0.05)),
+                               browser_name=argv.get("browser", "chrome"),
+                               lean=argv.get("leve", "sim").lower() in ["sim", "s"])))
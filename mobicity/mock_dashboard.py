@@ -0,0 +1,443 @@
+"""
+Painel do Mobicity local, para testes e medições sem acessar o painel real
+
+Reproduz a API que o `Mobicity._api_map` supõe para o painel (login, busca de endereços
+e agendamento de corridas) com as mesmas respostas de erro tratadas pelo `Mobicity`: 409
+para corrida já agendada e 422 para horário anterior ao permitido. Essa API não foi
+verificada no painel real, então passar aqui só mostra que o backend "http" e o mock
+concordam entre si; por isso o "http" só roda contra um painel apontado pelo `point`.
+
+Também serve as páginas `/`, `/travels/request` e `/travels` com o DOM que o
+`Mobicity._site_map` procura (mesmos caminhos XPath, ids e classes), incluindo as
+variantes do "Atenção!", para exercitar o backend "browser". Com `drift=True` serve uma
+versão seguinte do painel, com outras classes e caminhos, em que só os localizadores de
+reserva do `_site_map` encontram esses elementos.
+
+Example:
+--------
+```python
+from mobicity import Mobicity
+from mock_dashboard import MockDashboard
+
+with MockDashboard(latency=0.05) as server:
+    m = Mobicity(shift="day", time_to_work="05:55", time_to_home="19:05",
+                 start_day="20/02/2030", days=6, home="Rua de casa, 10")
+    server.point(m)
+    m.setup_rides(server.email, server.password, backend="http")
+```
+"""
+from datetime import datetime
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from time import sleep
+from urllib.parse import parse_qs, urlparse
+import json
+import secrets
+import zlib
+
+
+class MockDashboard:
+    def __init__(self, latency:float=0, email:str="usuario@petrobras.com.br", password:str="senha",
+                 port:int=0, drift:bool=False):
+        """
+        Parameters:
+        -----------
+        latency : float, default 0
+            Atraso, em segundos, aplicado a toda resposta do servidor.
+        email : str
+            E-mail do único usuário cadastrado.
+        password : str
+            Senha do único usuário cadastrado.
+        port : int, default 0
+            Porta do servidor, 0 escolhe uma porta livre.
+        drift : bool, default False
+            Serve as páginas da versão seguinte do painel (`_DRIFT_PATHS` e `_DRIFT_CLASS`).
+        """
+        self.latency = latency
+        self.drift = drift
+        self.email = email
+        self.password = password
+        # Corridas agendadas: (data, horário, origem, destino)
+        self.rides = []
+        self.tokens = set()
+        self._lock = Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), _handler(self))
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return "http://127.0.0.1:%i/" % self._server.server_address[1]
+
+    def start(self):
+        self._thread = Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def point(self, m):
+        """Aponta os links de uma instância do `Mobicity` para este servidor"""
+        m._link_mobicity = self.url
+        m._link_ride_request = self.url + "travels/request"
+        m._link_rides = self.url + "travels"
+        m._link_api = self.url + "api/"
+
+    def place(self, address:str) -> dict:
+        """Sugestão de endereço no formato da busca do painel"""
+        return {"description": address.strip(), "place_id": "place-%08x" % zlib.crc32(address.strip().encode())}
+
+    def validate(self, day:str, time:str) -> int:
+        """
+        Confere se o horário ainda pode ser agendado, retornando o status HTTP
+        """
+        when = datetime.strptime(day + " " + time, r"%d/%m/%y %H:%M")
+        return 422 if when < datetime.now() else 200
+
+    def book(self, day:str, time:str, origin:str, destination:str) -> int:
+        """
+        Agenda uma corrida, retornando o status HTTP da resposta do painel
+        """
+        if self.validate(day, time) != 200:
+            return 422
+        ride = (day, time, origin, destination)
+        with self._lock:
+            if any(r[:2] == ride[:2] for r in self.rides):
+                return 409
+            self.rides.append(ride)
+        return 201
+
+
+# Elementos de cada tela, no formato (caminho relativo à raiz, atributos, texto). Os
+# caminhos são os mesmos do `Mobicity._site_map`, a partir de #app ou de #portal.
+_FORM = "div/div/div/div[2]/div/div[2]/div/div[2]/"
+_APP_SCREENS = {
+    "login_user": [
+        ("div", {"id": "scrollable"}, ""),
+        ("div/div/div/div/div/div[3]/div[1]/input", {"id": "username", "type": "text"}, ""),
+    ],
+    "login_password": [
+        ("div", {"id": "scrollable"}, ""),
+        ("div/div/div/div/div/div[3]/div[1]/input", {"id": "username", "type": "text"}, ""),
+        ("div/div/div/div/div/div[4]/input", {"id": "password", "type": "password"}, ""),
+    ],
+    "home": [
+        ("div", {"id": "scrollable"}, ""),
+        ("div/div/div/div/div/h1", {}, "Bem-vindo"),
+    ],
+    "request": [
+        ("div", {"id": "scrollable"}, ""),
+        (_FORM + "div[1]/div[1]/div[1]/div/div/div[1]/div/input", {"id": "date", "type": "text"}, ""),
+        (_FORM + "div[1]/div[1]/div[2]/div/div/div[1]/div/input", {"id": "hour", "type": "text"}, ""),
+        (_FORM + "div[3]/div[1]/div/div[2]/div/div[1]/input", {"id": "from_field", "type": "text"}, ""),
+        (_FORM + "div[3]/div[1]/div/div[2]/div/div[2]/div", {"id": "from_menu"}, ""),
+        (_FORM + "div[3]/div[2]/div/div[2]/div/div[1]/input", {"id": "to_field", "type": "text"}, ""),
+        (_FORM + "div[3]/div[2]/div/div[2]/div/div[2]/div", {"id": "to_menu"}, ""),
+    ],
+    "rides": [
+        ("div", {"id": "scrollable"}, ""),
+        ("div/div/div/div[2]/div", {"id": "rides"}, ""),
+    ],
+}
+_PORTAL_SCREENS = {
+    "setup": [
+        ("div[2]/div/div[2]/div/div[3]", {"id": "forward_setup"}, "Avançar"),
+    ],
+    "before_time": [
+        ("div[2]/div/div[2]/div/div", {"class": "sc-bwzfXH cJwCtH"}, "Atenção!"),
+        ("div[2]/div/div[2]/div/p", {}, "O horário solicitado é anterior ao permitido."),
+    ],
+    "justify": [
+        ("div[2]/div/div[2]/div/div[2]/div[1]/div/input", {"id": "react-select-2-input", "type": "text"}, ""),
+        ("div[2]/div/div[2]/div/div[2]/div[1]/div/div", {"id": "justify_menu"}, ""),
+        ("div[2]/div/div[2]/div/div[2]/div[2]/div", {"id": "forward_justify"}, "Avançar"),
+    ],
+    "booked": [
+        ("div[2]/div/div[2]/div/div", {"class": "sc-bwzfXH kiYdrG"}, "Atenção!"),
+        ("div[2]/div/div[2]/div/p", {}, "Já existe uma corrida agendada neste horário."),
+    ],
+    "searching": [
+        ("div[2]/div/div[2]/div/p", {}, "Procurando motorista..."),
+    ],
+    "conclude": [
+        ("div[2]/div/div[2]/div/div/button", {"id": "forward_conclude", "class": "sc-htpNat lmHVNv eTZRCP"},
+         "Confirmar"),
+    ],
+    "finish": [
+        ("div[2]/div/div[2]/div[1]/div[1]/div[1]/label", {}, "Corrida agendada"),
+    ],
+}
+# Classes da sugestão de endereço de origem, uma para cada candidato do `_site_map`
+_FROM_CLICK_CLASS = "sc-htpNat kUpqyC jYLEny"
+
+# Versão seguinte do painel, servida com `drift=True`: as classes geradas pelo
+# styled-components mudam (`_DRIFT_CLASS` em todo elemento com classe, inclusive a
+# sugestão de endereço) e alguns campos mudam de lugar e ganham atributos, de forma que só
+# os candidatos de reserva do `_site_map` os encontram. {caminho atual: (caminho novo,
+# atributos acrescentados)}
+_DRIFT_CLASS = "sc-kGXeez dXqPzL"
+_DRIFT_PATHS = {
+    _FORM + "div[1]/div[1]/div[1]/div/div/div[1]/div/input": (_FORM + "div[1]/div[1]/div[1]/div/div/div[2]/input",
+                                                              {"placeholder": "Data"}),
+    _FORM + "div[1]/div[1]/div[2]/div/div/div[1]/div/input": (_FORM + "div[1]/div[1]/div[2]/div/div/div[2]/input",
+                                                              {"placeholder": "Horário"}),
+    "div[2]/div/div[2]/div[1]/div[1]/div[1]/label": ("div[2]/div/div[2]/div[1]/div[2]/label", {}),
+}
+
+def _drift(elements:list) -> list:
+    """Elementos de uma tela na versão seguinte do painel"""
+    drifted = []
+    for path, attrs, text in elements:
+        path, extra = _DRIFT_PATHS.get(path, (path, {}))
+        attrs = dict(attrs, **extra)
+        if "class" in attrs:
+            attrs["class"] = _DRIFT_CLASS
+        drifted.append((path, attrs, text))
+    return drifted
+
+def _render(elements:list) -> str:
+    """
+    Monta o HTML que satisfaz os caminhos de `elements`, completando com elementos vazios
+    as posições anteriores de cada caminho (`div[3]` precisa de mais duas `div` antes)
+    """
+    root = {"children": dict(), "attrs": dict(), "text": ""}
+    for path, attrs, text in elements:
+        node = root
+        for step in path.split("/"):
+            tag, _, index = step.partition("[")
+            key = (tag, int(index[:-1]) if index else 1)
+            node = node["children"].setdefault(key, {"children": dict(), "attrs": dict(), "text": ""})
+        node["attrs"].update(attrs)
+        node["text"] = text
+
+    def html(tag:str, node:dict) -> str:
+        attrs = "".join(' %s="%s"' % (k, escape(v)) for k, v in node["attrs"].items())
+        if tag == "input":
+            return "<input%s>" % attrs
+        return "<%s%s>%s%s</%s>" % (tag, attrs, escape(node["text"]), children(node), tag)
+
+    def children(node:dict) -> str:
+        out = ""
+        for tag in dict.fromkeys(tag for tag, _ in node["children"]):
+            last = max(index for t, index in node["children"] if t == tag)
+            empty = {"children": dict(), "attrs": dict(), "text": ""}
+            out += "".join(html(tag, node["children"].get((tag, i), empty)) for i in range(1, last + 1))
+        return out
+
+    return children(root)
+
+_PAGE = """<!DOCTYPE html>
+<html lang="pt-BR">
+<head><meta charset="utf-8"><title>Mobicity (local)</title></head>
+<body><div id="portal"></div><div id="app"></div>
+<script>
+const APP = %(app)s, PORTAL = %(portal)s, FROM_CLICK_CLASS = "%(from_click)s";
+const $ = id => document.getElementById(id);
+const app = $("app"), portal = $("portal");
+
+function api(path, body) {
+    return fetch("/api/" + path, {
+        method: body ? "POST" : "GET",
+        headers: {"Content-Type": "application/json",
+                  "Authorization": "Bearer " + (localStorage.getItem("token") || "")},
+        body: body ? JSON.stringify(body) : undefined
+    }).then(async r => ({status: r.status, data: await r.json()}));
+}
+
+function login(next) {
+    app.innerHTML = APP.login_user;
+    portal.innerHTML = "";
+    $("username").addEventListener("keydown", e => {
+        if (e.key !== "Enter") return;
+        const email = $("username").value;
+        app.innerHTML = APP.login_password;
+        $("username").value = email;
+        $("password").addEventListener("keydown", e => {
+            if (e.key !== "Enter") return;
+            api("auth/login", {email: email, password: $("password").value}).then(r => {
+                if (r.status !== 200) return;
+                localStorage.setItem("token", r.data.token);
+                next ? next() : (app.innerHTML = APP.home);
+            });
+        });
+    });
+}
+
+function autocomplete(field, menu, cls, chosen) {
+    let seq = 0;
+    $(field).addEventListener("input", () => {
+        const mine = ++seq, text = $(field).value;
+        api("places/autocomplete?input=" + encodeURIComponent(text)).then(r => {
+            if (mine !== seq || !r.data.length) return;
+            $(menu).innerHTML = '<div></div><div><div class="' + cls + '"></div></div>';
+            const option = $(menu).children[1].children[0];
+            option.textContent = r.data[0].description;
+            option.addEventListener("click", () => {
+                chosen[field] = r.data[0];
+                $(field).value = r.data[0].description;
+                $(menu).innerHTML = "";
+            });
+        });
+    });
+}
+
+function request() {
+    const chosen = {};
+    app.innerHTML = APP.request;
+    portal.innerHTML = PORTAL.setup;
+    autocomplete("from_field", "from_menu", FROM_CLICK_CLASS, chosen);
+    autocomplete("to_field", "to_menu", "", chosen);
+    $("forward_setup").addEventListener("click", () => {
+        const ride = {date: $("date").value, time: $("hour").value};
+        if (!chosen.from_field || !chosen.to_field) return;
+        api("travels/validate", ride).then(r => {
+            if (r.status === 422) { portal.innerHTML = PORTAL.before_time; return; }
+            justify(Object.assign(ride, {origin: chosen.from_field, destination: chosen.to_field}));
+        });
+    });
+}
+
+function justify(ride) {
+    portal.innerHTML = PORTAL.justify;
+    const input = $("react-select-2-input");
+    input.addEventListener("input", () => {
+        $("justify_menu").innerHTML = input.value
+            ? '<div id="react-select-2-option-0" class="option--is-focused">Turno</div>' : "";
+    });
+    input.addEventListener("keydown", e => {
+        if (e.key !== "Enter" || !$("react-select-2-option-0")) return;
+        ride.justification = $("react-select-2-option-0").textContent;
+        input.value = "";
+        $("justify_menu").innerHTML = "";
+    });
+    $("forward_justify").addEventListener("click", () => {
+        if (!ride.justification) return;
+        portal.innerHTML = PORTAL.searching;
+        api("travels", ride).then(r => {
+            if (r.status === 409) { portal.innerHTML = PORTAL.booked; return; }
+            if (r.status === 422) { portal.innerHTML = PORTAL.before_time; return; }
+            portal.innerHTML = PORTAL.conclude;
+            $("forward_conclude").addEventListener("click", () => { portal.innerHTML = PORTAL.finish; });
+        });
+    });
+}
+
+function rides() {
+    app.innerHTML = APP.rides;
+    api("travels").then(r => {
+        const table = document.createElement("table"), body = table.createTBody();
+        for (const ride of r.data) {
+            const row = body.insertRow();
+            for (const value of [ride.date, ride.time, ride.origin.description, ride.destination.description]) {
+                row.insertCell().textContent = value;
+            }
+        }
+        $("rides").appendChild(table);
+    });
+}
+
+const page = {"/travels/request": request, "/travels": rides}[location.pathname];
+api("auth/me").then(r => r.status === 200 ? (page ? page() : (app.innerHTML = APP.home)) : login(page));
+</script>
+</body>
+</html>
+"""
+
+def _handler(dashboard:MockDashboard):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Cabeçalho e corpo saem em escritas separadas, sem isso o keep-alive espera o ACK atrasado
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status:int, body=None):
+            payload = json.dumps(body if body is not None else {}).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _body(self) -> dict:
+            length = int(self.headers.get("Content-Length", 0))
+            return json.loads(self.rfile.read(length) or b"{}")
+
+        def _authorized(self) -> bool:
+            token = self.headers.get("Authorization", "").replace("Bearer ", "")
+            return token in dashboard.tokens
+
+        def do_GET(self):
+            sleep(dashboard.latency)
+            url = urlparse(self.path)
+            if url.path in ["/", "/travels", "/travels/request"]:
+                screen = _drift if dashboard.drift else list
+                page = (_PAGE % {"app": json.dumps({k: _render(screen(v)) for k, v in _APP_SCREENS.items()}),
+                                 "portal": json.dumps({k: _render(screen(v)) for k, v in _PORTAL_SCREENS.items()}),
+                                 "from_click": _DRIFT_CLASS if dashboard.drift else _FROM_CLICK_CLASS}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(page)))
+                self.end_headers()
+                return self.wfile.write(page)
+            if not self._authorized():
+                return self._send(401)
+            if url.path == "/api/auth/me":
+                return self._send(200)
+            if url.path == "/api/places/autocomplete":
+                address = parse_qs(url.query).get("input", [""])[0]
+                return self._send(200, [dashboard.place(address)] if address.strip() else [])
+            if url.path == "/api/travels":
+                return self._send(200, [{"date": day,
+                                         "time": time,
+                                         "origin": dashboard.place(origin),
+                                         "destination": dashboard.place(destination)}
+                                        for day, time, origin, destination in dashboard.rides])
+            self._send(404)
+
+        def do_POST(self):
+            sleep(dashboard.latency)
+            url = urlparse(self.path)
+            body = self._body()
+            if url.path == "/api/auth/login":
+                if (body.get("email"), body.get("password")) != (dashboard.email, dashboard.password):
+                    return self._send(401)
+                token = secrets.token_hex(16)
+                dashboard.tokens.add(token)
+                return self._send(200, {"token": token})
+            if not self._authorized():
+                return self._send(401)
+            if url.path == "/api/travels/validate":
+                status = dashboard.validate(body["date"], body["time"])
+                return self._send(status, {"status": status})
+            if url.path == "/api/travels":
+                # Endereço que não veio da busca do painel (place_id desconhecido)
+                if any(dashboard.place(body[k].get("description", "")) != body[k] for k in ["origin", "destination"]):
+                    return self._send(400, {"status": 400})
+                status = dashboard.book(body["date"], body["time"],
+                                        body["origin"]["description"], body["destination"]["description"])
+                return self._send(status, {"status": status})
+            self._send(404)
+
+    return Handler
+
+
+if __name__ == "__main__":
+    import sys
+
+    server = MockDashboard(latency=float(sys.argv[1]) if len(sys.argv) > 1 else 0).start()
+    print("Painel local em", server.url)
+    try:
+        server._thread.join()
+    except KeyboardInterrupt:
+        server.stop()
@@ -1,8 +1,13 @@
+from copy import deepcopy
 from datetime import datetime, time, timedelta
+from threading import Thread
+from time import sleep
 from mobicity import Mobicity
 
 import streamlit as st
-import pandas as pd
+
+# Atualização periódica de um trecho da página, sem rodar o script inteiro
+fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None)
 
 ## Inicialização de variáveis
 week = ["segunda-feira", "terça-feira", "quarta-feira", "quinta-feira", "sexta-feira", "sábado", "domingo"]
@@ -26,7 +31,7 @@ if "parameters" not in st.session_state:
 
 def somethingh_changed():
     # st.write(st.session_state.parameters)
-    st.session_state.parameters = {
+    parameters = {
         "shift": "day" if shift_go == 7 else "night",
         "time_to_work": time_to_work.strftime("%H:%M"),
         "time_to_home": time_to_home.strftime("%H:%M"),
@@ -34,8 +39,39 @@ def somethingh_changed():
         "days": days,
     }
     for k, v in st.session_state.addresses.items():
-        st.session_state.parameters[k] = v
-    st.session_state.m = Mobicity(**st.session_state.parameters)
+        parameters[k] = v
+    # A agenda (e os ajustes feitos nela) só é refeita se algum parâmetro mudou
+    if parameters != st.session_state.parameters or "m" not in st.session_state:
+        st.session_state.parameters = parameters
+        st.session_state.m = Mobicity(**parameters)
+
+def submit(m, email, passw, job):
+    # Roda em segundo plano: o progresso vai para `job`, que a página consulta
+    def progress(day, way, status):
+        job["progress"][(day, way)] = status
+    try:
+        job["results"] = m.setup_rides(email, passw, progress=progress)
+    except Exception as e:
+        job["error"] = e
+    finally:
+        job["done"] = True
+
+def job_status(polling):
+    job = st.session_state.get("job")
+    if job is None:
+        return
+    progress = list(job["progress"].items())
+    st.progress(len(progress) / max(1, job["total"]),
+                text="%i de %i viagens" % (len(progress), job["total"]))
+    for (day, way), status in progress:
+        st.write(day.strftime(r"%d/%m/%y"), "para o trabalho:" if way == "to_work" else "para casa:", str(status))
+    if job["error"] is not None:
+        st.error(f"Falha no agendamento: {job['error']}")
+    elif job["done"]:
+        st.success("Agendamento concluído")
+    if job["done"] and polling:
+        # Terminou: roda a página inteira para liberar o botão "Enviar"
+        st.rerun()
 
 #####################################
 
@@ -43,7 +79,7 @@ st.title("Configurações")
 c1, c2, c3, c4, c5, c6 = st.columns(6)
 with c1:
     first = st.date_input("Primeiro dia da escala", min_value=datetime.today(), format="DD/MM/YYYY")
-    st.write(week[first.isoweekday()].capitalize())
+    st.write(week[first.weekday()].capitalize())
 with c2:
     days = st.select_slider("Dias de agendamento", range(1,7)[::-1])
 with c3:
@@ -63,15 +99,7 @@ with c6:
         somethingh_changed()
 
 if "m" not in st.session_state:
-    st.session_state.m = Mobicity(
-        shift="day" if shift_go == 7 else "night",
-        time_to_work=time_to_work.strftime("%H:%M"),
-        time_to_home=time_to_home.strftime("%H:%M"),
-        start_day=first.strftime("%d/%m/%Y"),
-        days=days,
-        home="",
-        work="Av. Henrique Valadares, 28 - Centro, Rio de Janeiro - RJ, 20231-030, Brazil"
-    )
+    somethingh_changed()
 
 ###################################################
 st.write("## Endereços")
@@ -111,17 +139,21 @@ st.table({"Endereços": st.session_state.m.get_addresses()})
 
 def select_trip():
     st.write("## Edição de viagem")
-    trip = st.selectbox("Selecione a viagem",
-                        [" - ".join(l) for l in st.session_state.m.get_schedule().to_numpy()])
-    sdate, sfrom, sto, shour = trip.split(" - ")
-    sway = "to_work" if sto == "work" else "to_home"
-    sday, smonth, syear = [int(i) for i in sdate.split("/")]
-    syear = syear if syear > 2000 else syear + 2000
-    sweek = week[datetime(syear, smonth, sday).weekday()]
+    records = st.session_state.m.get_schedule_records()
+    if not records:
+        return
+    i = st.selectbox("Selecione a viagem", range(len(records)),
+                     format_func=lambda i: " - ".join([records[i]["date"],
+                                                       records[i]["origin"],
+                                                       records[i]["destination"],
+                                                       records[i]["time"]]))
+    ride = st.session_state.m.rides[i]
+    sfrom, sto, shour, sway = ride.origin, ride.destination, ride.time, ride.way
+    sweek = week[ride.weekday]
 
     c1, c2, c3, c4, c5 = st.columns(5)
     with c1:
-        ed_day = st.date_input("Dia", datetime(syear, smonth, sday), format="DD/MM/YYYY")
+        ed_day = st.date_input("Dia", ride.day, format="DD/MM/YYYY")
         st.write(sweek.capitalize())
     with c2:
         ind = list(st.session_state.addresses.keys()).index(sfrom)
@@ -147,9 +179,24 @@ passw = st.sidebar.text_input("Senha (do mobicity)", type="password")
 st.sidebar.write("Agendamentos")
 st.sidebar.write(st.session_state.m.get_schedule())
 
-if st.sidebar.button("Enviar"):
+running = "job" in st.session_state and not st.session_state.job["done"]
+if st.sidebar.button("Enviar", disabled=running):
     if st.session_state.m.get_addresses()["home"] != "":
-        st.session_state.m.browser_name = "chrome"
-        st.session_state.m.setup_rides(email, passw)
+        # O agendamento roda numa cópia, para que edições na página não o afetem
+        m = deepcopy(st.session_state.m)
+        m.browser_name = "chrome"
+        st.session_state.job = {"total": len(m.rides), "progress": dict(),
+                                "results": None, "error": None, "done": False}
+        Thread(target=submit, args=(m, email, passw, st.session_state.job), daemon=True).start()
+        running = True
+    else:
+        st.sidebar.error("Defina o endereço 'home'")
+
+with st.sidebar:
+    if fragment is not None:
+        fragment(run_every=1 if running else None)(job_status)(running)
     else:
-        st.sidebar.error("Defina o endereço 'home'")
\ No newline at end of file
+        job_status(False)
+        if running:
+            sleep(1)
+            st.rerun()
\ No newline at end of file
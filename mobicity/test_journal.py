@@ -0,0 +1,96 @@
+"""
+Confere a retomada pelo diário (`setup_rides(journal=True)`) contra o painel local, pelo
+backend "http": o que já foi agendado não é enviado de novo, o que ficou em envio ou
+falhou é reenviado, uma viagem alterada volta a ser enviada e, com `reconcile`, vale o
+que está no painel
+
+Uso:
+----
+```text
+python -m pytest mobicity/test_journal.py
+```
+"""
+import pytest
+
+import mobicity
+from mobicity import Mobicity, TooLate
+from mock_dashboard import MockDashboard
+
+
+class _Crash(BaseException):
+    """Queda do processo no meio do envio (fora das falhas tratadas pelo `setup_rides`)"""
+
+
+@pytest.fixture(autouse=True)
+def _cache(monkeypatch, tmp_path):
+    # Diário e caches numa pasta temporária, como com MOBICITY_CACHE
+    monkeypatch.setattr(mobicity, "_CACHE_DIR", str(tmp_path))
+    for name in ["_waits", "_places", "_locators"]:
+        monkeypatch.setattr(mobicity, name, None)
+
+@pytest.fixture
+def server():
+    with MockDashboard() as server:
+        yield server
+
+def _mobicity(server:MockDashboard) -> Mobicity:
+    m = Mobicity(shift="day", time_to_work="05:55", time_to_home="19:05",
+                 start_day="20/02/2030", days=2, home="R. de Casa, 10")
+    server.point(m)
+    return m
+
+def _run(server:MockDashboard, m:Mobicity, fail=None, **kwargs) -> list:
+    """Agenda pelo "http" com o diário e retorna as viagens `(dia, sentido)` enviadas"""
+    sent, setup_ride = [], m._http_setup_ride
+
+    def send(session, day, time, way, home, work):
+        sent.append((day, way))
+        if fail:
+            fail(day, way)
+        setup_ride(session, day, time, way, home, work)
+
+    m._http_setup_ride = send
+    try:
+        m.setup_rides(server.email, server.password, backend="http", journal=True, **kwargs)
+    finally:
+        del m._http_setup_ride
+    return sent
+
+
+def test_booked_rides_are_not_sent_again(server):
+    m = _mobicity(server)
+    assert len(_run(server, m)) == 4
+    assert _run(server, m) == []
+    assert len(server.rides) == 4
+
+def test_in_flight_and_failed_rides_are_sent_again(server):
+    m = _mobicity(server)
+
+    def fail(day, way):
+        if (day, way) == ("20/02/30", "to_home"):
+            raise TooLate("Tempo anterior")
+        if (day, way) == ("21/02/30", "to_work"):
+            raise _Crash()
+
+    with pytest.raises(_Crash):
+        _run(server, m, fail=fail)
+    # Antes da queda: uma agendada, uma com falha e uma em envio; a última nem começou
+    assert len(server.rides) == 1
+    assert _run(server, m) == [("20/02/30", "to_home"), ("21/02/30", "to_work"), ("21/02/30", "to_home")]
+    assert len(server.rides) == 4
+
+def test_changed_ride_goes_back_to_pending(server):
+    m = _mobicity(server)
+    _run(server, m)
+    m.setup_schedule_ride("21/02/2030", "to_home", time="20:00")
+    assert _run(server, m) == [("21/02/30", "to_home")]
+
+def test_reconcile_overrules_the_journal(server):
+    m = _mobicity(server)
+    _run(server, m)
+    # Corridas canceladas no painel depois de agendadas
+    server.rides.clear()
+    assert len(_run(server, m, reconcile=True)) == 4
+    assert len(server.rides) == 4
+    # e, com todas no painel, nada é enviado
+    assert _run(server, m, reconcile=True) == []
@@ -0,0 +1,123 @@
+"""
+Confere a classificação das falhas de cada viagem (`_ride_error`) e o que o
+`setup_rides` faz com cada uma: tentar de novo, refazer o login ou desistir
+
+Os passos do backend são trocados por um falso, pelo `_backend`, sem navegador nem painel.
+
+Uso:
+----
+```text
+python -m pytest mobicity/test_retries.py
+```
+"""
+import pytest
+
+import mobicity
+from mobicity import (AlreadyBooked, Mobicity, RideError, RideTimeout, SessionLost,
+                      TooLate, _ride_error)
+
+
+# Falhas com o nome das classes do selenium, sem importá-lo
+class TimeoutException(Exception):
+    pass
+
+class InvalidSessionIdException(Exception):
+    pass
+
+
+class _Backend:
+    """Backend falso: `failures[(dia, sentido)]` lista as falhas das tentativas, em ordem"""
+
+    def __init__(self, failures:dict=None, logins:int=None):
+        self.failures = failures or {}
+        self.logins = logins
+        self.sessions, self.calls, self.killed = [], [], []
+
+    def login(self, email, password):
+        if self.logins is not None and len(self.sessions) >= self.logins:
+            raise ValueError("Usuário ou senha inválidos")
+        self.sessions.append(len(self.sessions) + 1)
+        return self.sessions[-1]
+
+    def setup_ride(self, session, day, time, way, home, work):
+        self.calls.append((session, day, way))
+        failures = self.failures.get((day, way), [])
+        attempt = sum(1 for _, d, w in self.calls if (d, w) == (day, way)) - 1
+        if attempt < len(failures):
+            raise failures[attempt]
+
+    def scheduled_rides(self, session):
+        return set()
+
+    def kill(self, session):
+        self.killed.append(session)
+
+
+@pytest.fixture(autouse=True)
+def _no_backoff(monkeypatch, tmp_path):
+    monkeypatch.setattr(mobicity, "_RETRY_BACKOFF", 0)
+    monkeypatch.setattr(mobicity, "_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(mobicity, "_waits", None)
+
+def _setup(backend:_Backend, days:int=2, **kwargs) -> dict:
+    m = Mobicity(shift="day", time_to_work="05:55", time_to_home="19:05",
+                 start_day="20/02/2030", days=days, home="R. de Casa, 10")
+    m._backend = lambda name: (backend.login, backend.setup_ride, backend.scheduled_rides, backend.kill)
+    return {(day.strftime(r"%d/%m/%y"), way): error for day, way, error in m.setup_rides("a", "b", **kwargs)}
+
+
+def test_classification():
+    assert isinstance(_ride_error(TimeoutException("espera")), RideTimeout)
+    assert isinstance(_ride_error(InvalidSessionIdException("caiu")), SessionLost)
+    assert isinstance(_ride_error(ConnectionError("rede")), SessionLost)
+    booked = AlreadyBooked("Corrida já agendada")
+    assert _ride_error(booked) is booked
+    other = KeyError("desconhecida")
+    assert _ride_error(other) is other
+    assert RideTimeout.retry == "ride" and SessionLost.retry == "login"
+    assert AlreadyBooked.retry is None and TooLate.retry is None
+
+def test_timeout_is_retried():
+    backend = _Backend({("20/02/30", "to_work"): [TimeoutException("espera")] * 2})
+    results = _setup(backend)
+    assert results[("20/02/30", "to_work")] is None
+    assert sum(1 for _, day, way in backend.calls if (day, way) == ("20/02/30", "to_work")) == 3
+    assert len(backend.sessions) == 1
+
+def test_timeout_gives_up_after_retries():
+    backend = _Backend({("20/02/30", "to_work"): [TimeoutException("espera")] * 5})
+    results = _setup(backend)
+    assert isinstance(results[("20/02/30", "to_work")], RideTimeout)
+    assert sum(1 for _, day, way in backend.calls if (day, way) == ("20/02/30", "to_work")) == 3
+
+@pytest.mark.parametrize("error", [AlreadyBooked("Corrida já agendada"), TooLate("Tempo anterior")])
+def test_final_errors_are_not_retried(error):
+    backend = _Backend({("20/02/30", "to_home"): [error]})
+    results = _setup(backend)
+    assert results[("20/02/30", "to_home")] is error
+    assert sum(1 for _, day, way in backend.calls if (day, way) == ("20/02/30", "to_home")) == 1
+
+def test_session_lost_logs_in_again():
+    backend = _Backend({("20/02/30", "to_home"): [InvalidSessionIdException("caiu")]})
+    results = _setup(backend)
+    assert all(error is None for error in results.values())
+    assert backend.sessions == [1, 2]
+    # A sessão caída é fechada na hora e a nova envia o restante da fila
+    assert backend.killed[0] == 1
+    assert [session for session, *_ in backend.calls][-1] == 2
+
+def test_failed_relogin_fails_the_rest_of_the_queue():
+    backend = _Backend({("20/02/30", "to_home"): [InvalidSessionIdException("caiu")]}, logins=1)
+    results = _setup(backend, days=3)
+    assert results[("20/02/30", "to_work")] is None
+    failed = [results[key] for key in results if key != ("20/02/30", "to_work")]
+    assert len(failed) == 5
+    assert all(isinstance(error, ValueError) and error is failed[0] for error in failed)
+    # Nenhuma viagem é enviada depois da falha do login
+    assert len(backend.calls) == 2
+
+def test_errors_are_ride_errors():
+    backend = _Backend({("21/02/30", "to_work"): [TimeoutException("espera")] * 5,
+                        ("21/02/30", "to_home"): [TooLate("Tempo anterior")]})
+    results = _setup(backend)
+    assert all(isinstance(error, RideError) for error in results.values() if error is not None)
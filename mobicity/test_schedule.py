@@ -0,0 +1,60 @@
+"""
+Confere que a agenda atualizada aos poucos (regras e ajustes alterados depois da
+montagem) é igual à agenda refeita por inteiro, inclusive na ordem das viagens
+
+Uso:
+----
+```text
+python -m pytest mobicity/test_schedule.py
+```
+"""
+from copy import deepcopy
+
+from mobicity import Mobicity
+
+
+def _mobicity(**kwargs) -> Mobicity:
+    params = dict(time_to_work="05:55", time_to_home="19:05", start_day="20/02/2030",
+                  home="R. de Casa, 10")
+    params.update(kwargs)
+    m = Mobicity(**params)
+    # Lê a agenda uma vez, para que as próximas alterações sigam pelo caminho incremental
+    m.rides
+    return m
+
+def _check(m:Mobicity):
+    """Compara a agenda incremental com a refeita, viagem a viagem e na mesma ordem"""
+    full = deepcopy(m)
+    full._stale = True
+    assert m.rides == full.rides
+    assert m.get_schedule_records() == full.get_schedule_records()
+
+
+def test_override_on_day_off_keeps_date_order():
+    m = _mobicity(rotation="2D+1F", days=6)
+    m.setup_schedule_ride("22/02/2030", "to_work", time="09:00")
+    _check(m)
+    assert [ride.day for ride in m.rides] == sorted(ride.day for ride in m.rides)
+
+def test_override_changes_and_resets():
+    m = _mobicity(shift="day", days=6)
+    m.setup_schedule_ride("21/02/2030", "to_home", time="20:00", home="R. de Casa, 10")
+    _check(m)
+    m.setup_schedule_ride("21/02/2030", "to_home")
+    _check(m)
+
+def test_override_removed_from_day_off():
+    m = _mobicity(rotation="2D+1F", days=6)
+    m.setup_schedule_ride("22/02/2030", "to_home", time="18:00")
+    _check(m)
+    m.setup_schedule_ride("22/02/2030", "to_home")
+    _check(m)
+    assert not [ride for ride in m.rides if ride.day.day == 22]
+
+def test_weekly_rule_changes():
+    m = _mobicity(rotation="3D+3N", days=12)
+    m.setup_schedule_ride("21/02/2030", "to_work", time="06:30")
+    m.setup_schedule_weekdays("to_home", [0, 1, 2], time="18:45", shift="day")
+    _check(m)
+    m.setup_schedule_weekdays("to_work", [3, 4], time="17:30", shift="night")
+    _check(m)